@@ -15,7 +15,7 @@ from homeassistant.const import (
     CONF_USERNAME,
     Platform,
 )
-from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import config_validation as cv, device_registry as dr
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.loader import async_get_loaded_integration
 
@@ -36,12 +36,19 @@ from .coordinator import (
     PetkitMediaUpdateCoordinator,
 )
 from .data import PetkitData
+from .image import PetkitImageView
+from .media_catalog import get_catalog_path, remove_catalog
+from .media_view import PetkitMediaView
+from .services import async_setup_services
 
 if TYPE_CHECKING:
     from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.typing import ConfigType
 
     from .data import PetkitConfigEntry
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
 PLATFORMS: list[Platform] = [
     Platform.SENSOR,
     Platform.BINARY_SENSOR,
@@ -55,6 +62,14 @@ PLATFORMS: list[Platform] = [
 ]
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Petkit component."""
+    hass.http.register_view(PetkitMediaView(hass))
+    hass.http.register_view(PetkitImageView(hass))
+    async_setup_services(hass)
+    return True
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: PetkitConfigEntry,
@@ -110,14 +125,14 @@ async def async_setup_entry(
     await coordinator_bluetooth.async_config_entry_first_refresh()
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {}
 
     hass.data[DOMAIN][COORDINATOR] = coordinator
-    hass.data[DOMAIN][COORDINATOR_MEDIA] = coordinator
-    hass.data[DOMAIN][COORDINATOR_BLUETOOTH] = coordinator
+    hass.data[DOMAIN][COORDINATOR_MEDIA] = coordinator_media
+    hass.data[DOMAIN][COORDINATOR_BLUETOOTH] = coordinator_bluetooth
 
     return True
 
@@ -130,13 +145,11 @@ async def async_unload_entry(
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
 
-async def async_reload_entry(
-    hass: HomeAssistant,
-    entry: PetkitConfigEntry,
-) -> None:
-    """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
+async def async_remove_entry(hass: HomeAssistant, entry: PetkitConfigEntry) -> None:
+    """Remove the media catalog of a removed entry."""
+    await hass.async_add_executor_job(
+        remove_catalog, get_catalog_path(hass, entry.entry_id)
+    )
 
 
 async def async_update_options(hass: HomeAssistant, entry: PetkitConfigEntry) -> None:
@@ -41,10 +41,16 @@ from .const import (
     CODE_TO_COUNTRY_DICT,
     CONF_BLE_RELAY_ENABLED,
     CONF_DELETE_AFTER,
+    CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT,
+    CONF_MEDIA_DEVICE_QUOTA_VIDEO,
     CONF_MEDIA_DL_IMAGE,
     CONF_MEDIA_DL_VIDEO,
     CONF_MEDIA_EV_TYPE,
+    CONF_MEDIA_EVICTION,
+    CONF_MEDIA_IMAGE_WIDTHS,
     CONF_MEDIA_PATH,
+    CONF_MEDIA_QUOTA_SNAPSHOT,
+    CONF_MEDIA_QUOTA_VIDEO,
     CONF_SCAN_INTERVAL_BLUETOOTH,
     CONF_SCAN_INTERVAL_MEDIA,
     CONF_SMART_POLLING,
@@ -54,13 +60,19 @@ from .const import (
     DEFAULT_DL_IMAGE,
     DEFAULT_DL_VIDEO,
     DEFAULT_EVENTS,
+    DEFAULT_MEDIA_EVICTION,
+    DEFAULT_MEDIA_IMAGE_WIDTHS,
     DEFAULT_MEDIA_PATH,
+    DEFAULT_MEDIA_QUOTA,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_SCAN_INTERVAL_BLUETOOTH,
     DEFAULT_SCAN_INTERVAL_MEDIA,
     DEFAULT_SMART_POLLING,
     DOMAIN,
     LOGGER,
+    MEDIA_EVICTION_LEAST_VIEWED,
+    MEDIA_EVICTION_OLDEST,
+    MEDIA_IMAGE_WIDTHS,
     MEDIA_SECTION,
 )
 
@@ -145,6 +157,66 @@ class PetkitOptionsFlowHandler(OptionsFlow):
                                         MEDIA_SECTION, {}
                                     ).get(CONF_DELETE_AFTER, DEFAULT_DELETE_AFTER),
                                 ): vol.All(int, vol.Range(min=0, max=30)),
+                                vol.Required(
+                                    CONF_MEDIA_QUOTA_SNAPSHOT,
+                                    default=self.config_entry.options.get(
+                                        MEDIA_SECTION, {}
+                                    ).get(
+                                        CONF_MEDIA_QUOTA_SNAPSHOT, DEFAULT_MEDIA_QUOTA
+                                    ),
+                                ): vol.All(int, vol.Range(min=0)),
+                                vol.Required(
+                                    CONF_MEDIA_QUOTA_VIDEO,
+                                    default=self.config_entry.options.get(
+                                        MEDIA_SECTION, {}
+                                    ).get(CONF_MEDIA_QUOTA_VIDEO, DEFAULT_MEDIA_QUOTA),
+                                ): vol.All(int, vol.Range(min=0)),
+                                vol.Required(
+                                    CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT,
+                                    default=self.config_entry.options.get(
+                                        MEDIA_SECTION, {}
+                                    ).get(
+                                        CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT,
+                                        DEFAULT_MEDIA_QUOTA,
+                                    ),
+                                ): vol.All(int, vol.Range(min=0)),
+                                vol.Required(
+                                    CONF_MEDIA_DEVICE_QUOTA_VIDEO,
+                                    default=self.config_entry.options.get(
+                                        MEDIA_SECTION, {}
+                                    ).get(
+                                        CONF_MEDIA_DEVICE_QUOTA_VIDEO,
+                                        DEFAULT_MEDIA_QUOTA,
+                                    ),
+                                ): vol.All(int, vol.Range(min=0)),
+                                vol.Required(
+                                    CONF_MEDIA_EVICTION,
+                                    default=self.config_entry.options.get(
+                                        MEDIA_SECTION, {}
+                                    ).get(CONF_MEDIA_EVICTION, DEFAULT_MEDIA_EVICTION),
+                                ): selector.SelectSelector(
+                                    selector.SelectSelectorConfig(
+                                        options=[
+                                            MEDIA_EVICTION_OLDEST,
+                                            MEDIA_EVICTION_LEAST_VIEWED,
+                                        ],
+                                    )
+                                ),
+                                vol.Optional(
+                                    CONF_MEDIA_IMAGE_WIDTHS,
+                                    default=self.config_entry.options.get(
+                                        MEDIA_SECTION, {}
+                                    ).get(
+                                        CONF_MEDIA_IMAGE_WIDTHS,
+                                        DEFAULT_MEDIA_IMAGE_WIDTHS,
+                                    ),
+                                ): selector.SelectSelector(
+                                    selector.SelectSelectorConfig(
+                                        multiple=True,
+                                        sort=False,
+                                        options=MEDIA_IMAGE_WIDTHS,
+                                    )
+                                ),
                             }
                         ),
                         {"collapsed": False},
@@ -250,6 +322,11 @@ class PetkitFlowHandler(ConfigFlow, domain=DOMAIN):
                                 CONF_MEDIA_DL_VIDEO: DEFAULT_DL_VIDEO,
                                 CONF_MEDIA_EV_TYPE: DEFAULT_EVENTS,
                                 CONF_DELETE_AFTER: DEFAULT_DELETE_AFTER,
+                                CONF_MEDIA_QUOTA_SNAPSHOT: DEFAULT_MEDIA_QUOTA,
+                                CONF_MEDIA_QUOTA_VIDEO: DEFAULT_MEDIA_QUOTA,
+                                CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT: DEFAULT_MEDIA_QUOTA,
+                                CONF_MEDIA_DEVICE_QUOTA_VIDEO: DEFAULT_MEDIA_QUOTA,
+                                CONF_MEDIA_EVICTION: DEFAULT_MEDIA_EVICTION,
                             },
                             BT_SECTION: {
                                 CONF_BLE_RELAY_ENABLED: DEFAULT_BLUETOOTH_RELAY,
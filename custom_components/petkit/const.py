@@ -22,6 +22,12 @@ CONF_MEDIA_DL_IMAGE = "media_dl_image"
 CONF_MEDIA_EV_TYPE = "media_ev_type"
 CONF_DELETE_AFTER = "delete_media_after"
 CONF_MEDIA_PATH = "media_path"
+CONF_MEDIA_QUOTA_SNAPSHOT = "media_quota_snapshot"
+CONF_MEDIA_QUOTA_VIDEO = "media_quota_video"
+CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT = "media_device_quota_snapshot"
+CONF_MEDIA_DEVICE_QUOTA_VIDEO = "media_device_quota_video"
+CONF_MEDIA_EVICTION = "media_eviction"
+CONF_MEDIA_IMAGE_WIDTHS = "media_image_widths"
 
 # Default configuration values
 DEFAULT_SCAN_INTERVAL = 60
@@ -34,11 +40,39 @@ DEFAULT_SMART_POLLING = True
 DEFAULT_BLUETOOTH_RELAY = True
 DEFAULT_DELETE_AFTER = 3
 DEFAULT_MEDIA_PATH = "/media"
+DEFAULT_MEDIA_QUOTA = 0
+MEDIA_EVICTION_OLDEST = "Oldest"
+MEDIA_EVICTION_LEAST_VIEWED = "Least viewed"
+DEFAULT_MEDIA_EVICTION = MEDIA_EVICTION_OLDEST
+MEDIA_IMAGE_WIDTHS = ["160", "320", "640", "1280"]
+DEFAULT_MEDIA_IMAGE_WIDTHS = ["320", "640"]
 
 # Update interval
 MAX_SCAN_INTERVAL = 120
 MIN_SCAN_INTERVAL = 5
 
+# Media synchronization
+MEDIA_SYNC_MAX_CONCURRENT = 3
+# Event types downloaded first, shown by the "Last eat/usage event" images
+MEDIA_PRIORITY_EVENTS = ["eat", "toileting"]
+MEDIA_CHECKSUM_BATCH_SIZE = 50
+MEDIA_WATCHER_DEBOUNCE = 2  # seconds
+MEDIA_RECONCILE_INTERVAL = 60  # minutes
+MEDIA_DOWNLOAD_CHUNK_SIZE = 64 * 1024  # bytes
+MEDIA_DOWNLOAD_TIMEOUT = 60  # seconds without receiving data
+MEDIA_EVICTION_BATCH_SIZE = 50
+MEDIA_EVICTION_BATCH_DELAY = 1  # seconds
+MEDIA_THUMBNAIL_SIZE = 320  # pixels
+MEDIA_THUMBNAIL_QUALITY = 75
+MEDIA_THUMBNAIL_WORKERS = 2
+MEDIA_THUMBNAIL_BATCH_SIZE = 100
+MEDIA_FASTSTART_BATCH_SIZE = 20
+MEDIA_BROWSER_PAGE_SIZE = 50
+MEDIA_BROWSER_CACHE_SIZE = 200  # browsed nodes
+MEDIA_BROWSER_CACHE_TTL = 3600  # seconds, below the signed URLs expiry
+MEDIA_IMAGE_CACHE_SIZE = 16 * 1024 * 1024  # bytes
+MEDIA_EXPORT_BATCH_SIZE = 500
+
 # Petkit devices types to name translation
 PETKIT_DEVICES_MAPPING = {
     "0k2": "Air Magicube",
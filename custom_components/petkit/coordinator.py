@@ -3,18 +3,19 @@
 from __future__ import annotations
 
 import asyncio
-from copy import deepcopy
+from collections import Counter
+from collections.abc import Iterable
 from datetime import datetime, timedelta, timezone
+from itertools import count
 from pathlib import Path
-import shutil
 from typing import Any
 
-import aiofiles
 import aiofiles.os
+import aiohttp
 from pypetkitapi import (
-    DownloadDecryptMedia,
     Feeder,
     Litter,
+    MediaCloud,
     MediaFile,
     MediaType,
     Pet,
@@ -28,32 +29,64 @@ from pypetkitapi import (
     WaterFountain,
 )
 
+from homeassistant.core import CALLBACK_TYPE, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
     BT_SECTION,
     CONF_BLE_RELAY_ENABLED,
     CONF_DELETE_AFTER,
+    CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT,
+    CONF_MEDIA_DEVICE_QUOTA_VIDEO,
     CONF_MEDIA_DL_IMAGE,
     CONF_MEDIA_DL_VIDEO,
     CONF_MEDIA_EV_TYPE,
+    CONF_MEDIA_EVICTION,
+    CONF_MEDIA_IMAGE_WIDTHS,
     CONF_MEDIA_PATH,
+    CONF_MEDIA_QUOTA_SNAPSHOT,
+    CONF_MEDIA_QUOTA_VIDEO,
     CONF_SMART_POLLING,
     DEFAULT_BLUETOOTH_RELAY,
     DEFAULT_DELETE_AFTER,
     DEFAULT_DL_IMAGE,
     DEFAULT_DL_VIDEO,
     DEFAULT_EVENTS,
+    DEFAULT_MEDIA_EVICTION,
+    DEFAULT_MEDIA_IMAGE_WIDTHS,
     DEFAULT_MEDIA_PATH,
+    DEFAULT_MEDIA_QUOTA,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_SMART_POLLING,
     DOMAIN,
     LOGGER,
+    MEDIA_CHECKSUM_BATCH_SIZE,
+    MEDIA_EVICTION_LEAST_VIEWED,
+    MEDIA_FASTSTART_BATCH_SIZE,
+    MEDIA_PRIORITY_EVENTS,
+    MEDIA_RECONCILE_INTERVAL,
     MEDIA_SECTION,
+    MEDIA_SYNC_MAX_CONCURRENT,
     MIN_SCAN_INTERVAL,
 )
+from .media_catalog import get_catalog_path
+from .media_download import PetkitMediaDownloader
+from .media_index import (
+    PetkitMediaIndex,
+    get_event_pets,
+    get_media_file_path,
+    get_media_source,
+)
+from .media_retention import MEGABYTE, MediaRetentionPolicy, PetkitMediaRetention
+from .media_sync import MediaSyncProgress, PetkitMediaSyncJob
+from .media_thumbnail import PetkitMediaThumbnails
+from .media_watcher import PetkitMediaWatcher
+
+# (priority, sequence, media, media type) items of the media download queue
+type MediaDownload = tuple[tuple[bool, int, bool], int, MediaCloud, MediaType]
 
 
 class PetkitDataUpdateCoordinator(DataUpdateCoordinator):
@@ -71,6 +104,9 @@ class PetkitDataUpdateCoordinator(DataUpdateCoordinator):
         self.config_entry = config_entry
         self.previous_devices = set()
         self.curent_devices = set()
+        self.device_names: dict[int, str] = {}
+        self._named_devices: set[int] = set()
+        self._media_event_ids: dict[int, set[str]] = {}
         self.fast_poll_tic = 0
 
     def enable_smart_polling(self, nb_tic: int) -> None:
@@ -120,6 +156,15 @@ class PetkitDataUpdateCoordinator(DataUpdateCoordinator):
         else:
             data = self.config_entry.runtime_data.client.petkit_entities
             self.current_devices = set(data)
+            if self.current_devices != self._named_devices:
+                self._named_devices = self.current_devices
+                self.device_names = {
+                    device_id: device.device_nfo.device_name.capitalize()
+                    for device_id, device in data.items()
+                    if device.device_nfo is not None
+                }
+
+            self._signal_new_media(data)
 
             # Check if there are any stale devices
             if stale_devices := self.previous_devices - self.current_devices:
@@ -136,6 +181,27 @@ class PetkitDataUpdateCoordinator(DataUpdateCoordinator):
                 self.previous_devices = self.current_devices
             return data
 
+    def _signal_new_media(self, data: dict[int, Any]) -> None:
+        """Request the media of the devices having new media events.
+
+        Media events are gathered from the device records at each poll, the
+        first poll of a device being covered by the initial media sync.
+        """
+        new_media_devices = set()
+        for device_id, device in data.items():
+            event_ids = {
+                media.event_id for media in getattr(device, "medias", None) or []
+            }
+            known_ids = self._media_event_ids.get(device_id)
+            if known_ids is not None and event_ids - known_ids:
+                new_media_devices.add(device_id)
+            self._media_event_ids[device_id] = event_ids
+
+        if new_media_devices:
+            self.config_entry.runtime_data.coordinator_media.async_request_device_sync(
+                new_media_devices
+            )
+
 
 class PetkitMediaUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching data from the API."""
@@ -154,13 +220,28 @@ class PetkitMediaUpdateCoordinator(DataUpdateCoordinator):
         self.config_entry = config_entry
         self.data_coordinator = data_coordinator
         self.media_type = []
+        self.image_widths: list[int] = []
+        # Pets recognized in the events being synced, by event id
+        self._event_pets: dict[str, str] = {}
         self.event_type = []
         self.previous_devices = set()
-        self.media_table = {}
-        self.delete_after = 0
+        self.media_table: dict[int, tuple[MediaFile, ...]] = {}
+        self.retention_policy = MediaRetentionPolicy()
         self.media_path = Path()
         # Load configuration
         self._get_media_config(config_entry.options)
+        self.media_index = PetkitMediaIndex(
+            hass, self.media_path, get_catalog_path(hass, config_entry.entry_id)
+        )
+        self.media_retention = PetkitMediaRetention(
+            hass, self.media_index, self.retention_policy
+        )
+        self.media_thumbnails = PetkitMediaThumbnails(hass, self.media_index)
+        self.media_watcher = PetkitMediaWatcher(
+            hass, self.media_index, self._async_media_index_changed
+        )
+        self._unsub_reconcile: CALLBACK_TYPE | None = None
+        self.media_sync = PetkitMediaSyncJob(hass, config_entry, self._async_sync_media)
 
     def _get_media_config(self, options) -> None:
         """Get media configuration."""
@@ -169,95 +250,293 @@ class PetkitMediaUpdateCoordinator(DataUpdateCoordinator):
         dl_image = media_options.get(CONF_MEDIA_DL_IMAGE, DEFAULT_DL_IMAGE)
         dl_video = media_options.get(CONF_MEDIA_DL_VIDEO, DEFAULT_DL_VIDEO)
         self.media_path = Path(media_options.get(CONF_MEDIA_PATH, DEFAULT_MEDIA_PATH))
-        self.delete_after = media_options.get(CONF_DELETE_AFTER, DEFAULT_DELETE_AFTER)
+        self.retention_policy = MediaRetentionPolicy(
+            delete_after=media_options.get(CONF_DELETE_AFTER, DEFAULT_DELETE_AFTER),
+            snapshot_quota=media_options.get(
+                CONF_MEDIA_QUOTA_SNAPSHOT, DEFAULT_MEDIA_QUOTA
+            )
+            * MEGABYTE,
+            video_quota=media_options.get(CONF_MEDIA_QUOTA_VIDEO, DEFAULT_MEDIA_QUOTA)
+            * MEGABYTE,
+            device_snapshot_quota=media_options.get(
+                CONF_MEDIA_DEVICE_QUOTA_SNAPSHOT, DEFAULT_MEDIA_QUOTA
+            )
+            * MEGABYTE,
+            device_video_quota=media_options.get(
+                CONF_MEDIA_DEVICE_QUOTA_VIDEO, DEFAULT_MEDIA_QUOTA
+            )
+            * MEGABYTE,
+            least_accessed=media_options.get(
+                CONF_MEDIA_EVICTION, DEFAULT_MEDIA_EVICTION
+            )
+            == MEDIA_EVICTION_LEAST_VIEWED,
+        )
 
         self.event_type = [RecordType(element.lower()) for element in event_type_config]
+        self.image_widths = sorted(
+            int(width)
+            for width in media_options.get(
+                CONF_MEDIA_IMAGE_WIDTHS, DEFAULT_MEDIA_IMAGE_WIDTHS
+            )
+        )
 
         if dl_image:
             self.media_type.append(MediaType.IMAGE)
         if dl_video:
             self.media_type.append(MediaType.VIDEO)
 
-    async def _async_update_data(
-        self,
-    ) -> dict[str, list[MediaFile]]:
-        """Update data via library."""
+    async def _async_setup(self) -> None:
+        """Load the media index and keep it in sync with the media path."""
+        await self.media_index.async_load()
+        self._refresh_media_table(self.data_coordinator.current_devices)
 
-        self.hass.async_create_task(
-            self._async_update_media_files(self.data_coordinator.current_devices)
+        try:
+            await self.hass.async_add_executor_job(
+                self.media_watcher.start, self.data_coordinator.current_devices
+            )
+        except OSError as err:
+            LOGGER.warning(
+                f"Unable to watch media path {self.media_path}, relying on periodic reconciliation: {err}"
+            )
+        self._unsub_reconcile = async_track_time_interval(
+            self.hass,
+            self._async_reconcile_media,
+            timedelta(minutes=MEDIA_RECONCILE_INTERVAL),
         )
+
+    async def _async_reconcile_media(self, _now) -> None:
+        """Catch the media changes missed by the watcher."""
+        if changed := await self.media_index.async_reconcile():
+            self._async_media_index_changed(changed)
+
+    @callback
+    def _async_media_index_changed(self, device_ids: set[int]) -> None:
+        """Refresh the media table of devices whose media changed on disk."""
+        if self._refresh_media_table(device_ids):
+            self._async_publish_media_table()
+
+    @callback
+    def _async_publish_media_table(self) -> None:
+        """Publish the media table to the entities.
+
+        Unlike async_set_updated_data, the refresh timer is not reset, so that
+        event-driven syncs do not postpone the periodic one.
+        """
+        self.data = self.media_table
+        self.async_update_listeners()
+
+    def _refresh_media_table(self, device_ids: Iterable[int]) -> bool:
+        """Refresh the media table of devices, return True if it changed.
+
+        The media table is copy-on-write: it is only replaced when the media
+        snapshot of a device changed, unchanged devices keep sharing theirs.
+        """
+        changes = {
+            device: snapshot
+            for device in device_ids
+            if (snapshot := self.media_index.get_device_media(device))
+            is not self.media_table.get(device)
+        }
+        if changes:
+            self.media_table = self.media_table | changes
+        return bool(changes)
+
+    async def _async_update_data(
+        self,
+    ) -> dict[int, tuple[MediaFile, ...]]:
+        """Start a media sync, its results are published as each device finishes."""
+        self.media_sync.async_request()
         return self.media_table
 
-    async def _async_update_media_files(self, devices_lst: set) -> None:
-        """Update media files."""
+    @callback
+    def async_request_device_sync(self, device_ids: set[int]) -> None:
+        """Fetch the new media of devices without waiting for the media interval."""
+        LOGGER.debug(f"New media events for device ids = {device_ids}")
+        self.media_sync.async_request(device_ids)
+
+    async def _async_sync_media(
+        self, device_ids: set[int] | None, progress: MediaSyncProgress
+    ) -> None:
+        """Sync the media of devices, all current devices if None."""
+        devices = self.data_coordinator.current_devices
+        if device_ids is not None:
+            devices = devices & device_ids
+        await self._async_update_media_files(devices, progress)
+
+    async def async_shutdown(self) -> None:
+        """Cancel any scheduled call, stop the media watcher and close the catalog."""
+        await super().async_shutdown()
+        await self.media_sync.async_cancel()
+        if self._unsub_reconcile is not None:
+            self._unsub_reconcile()
+            self._unsub_reconcile = None
+        self.media_watcher.async_cancel_flush()
+        await self.hass.async_add_executor_job(self.media_watcher.stop)
+        await self.hass.async_add_executor_job(self.media_thumbnails.shutdown)
+        await self.media_index.async_close()
+
+    async def _async_update_media_files(
+        self, devices_lst: set, progress: MediaSyncProgress
+    ) -> None:
+        """Download the missing media files of all devices, by priority."""
         client = self.config_entry.runtime_data.client
-
+        await self.hass.async_add_executor_job(
+            self.media_watcher.watch_devices, devices_lst
+        )
+        self._event_pets = {
+            event_id: pet_id
+            for device in devices_lst
+            for event_id, pet_id in get_event_pets(
+                client.petkit_entities.get(device)
+            ).items()
+        }
+        queue: asyncio.PriorityQueue[MediaDownload] = asyncio.PriorityQueue()
+        sequence = count()
+        pending: Counter[int] = Counter()
         for device in devices_lst:
-            if not hasattr(client.petkit_entities[device], "medias"):
-                LOGGER.debug(f"Device id = {device} does not support medias")
-                continue
-
-            media_lst = client.petkit_entities[device].medias
-
-            if not media_lst:
-                LOGGER.debug(f"No medias found for device id = {device}")
-                continue
-
-            LOGGER.debug(f"Gathering medias files onto disk for device id = {device}")
-            await client.media_manager.gather_all_media_from_disk(
-                self.media_path, device
-            )
-            to_dl = await client.media_manager.list_missing_files(
-                media_lst, self.media_type, self.event_type
-            )
+            for media, missing_types in self._list_missing_media(device):
+                for media_type in missing_types:
+                    pending[media.device_id] += 1
+                    queue.put_nowait(
+                        (
+                            self._download_priority(media, media_type),
+                            next(sequence),
+                            media,
+                            media_type,
+                        )
+                    )
 
-            dl_mgt = DownloadDecryptMedia(self.media_path, client)
-            for media in to_dl:
-                await dl_mgt.download_file(media, self.media_type)
-            LOGGER.debug(
-                f"Downloaded all medias for device id = {device} is OK (got {len(to_dl)} files to download)"
-            )
-            self.media_table[device] = deepcopy(
-                await client.media_manager.gather_all_media_from_disk(
-                    self.media_path, device
-                )
+        LOGGER.debug(f"Got {queue.qsize()} media files to download")
+        progress.files_queued = queue.qsize()
+        await asyncio.gather(
+            *(
+                self._async_download_worker(queue, pending, progress)
+                for _ in range(min(MEDIA_SYNC_MAX_CONCURRENT, queue.qsize()))
             )
+        )
+        self._refresh_media_table(devices_lst)
         LOGGER.debug("Update media files finished for all devices")
         await self._async_delete_old_media()
+        await self.media_thumbnails.async_generate_pending()
+        await self.media_index.async_faststart_videos(MEDIA_FASTSTART_BATCH_SIZE)
+        await self.media_index.async_backfill_checksums(MEDIA_CHECKSUM_BATCH_SIZE)
+
+    def _list_missing_media(
+        self, device: int
+    ) -> list[tuple[MediaCloud, list[MediaType]]]:
+        """List the media of a device with the media types not downloaded yet."""
+        client = self.config_entry.runtime_data.client
 
-    async def _async_delete_old_media(self) -> None:
-        """Delete old media files based on the retention policy."""
-        if self.delete_after == 0:
-            LOGGER.debug("Media deletion is disabled by configuration")
-            return
+        if not hasattr(client.petkit_entities[device], "medias"):
+            LOGGER.debug(f"Device id = {device} does not support medias")
+            return []
 
-        retention_date = datetime.now() - timedelta(days=self.delete_after)
+        media_lst = client.petkit_entities[device].medias
 
-        for device_id in self.data_coordinator.current_devices:
-            device_media_path = self.media_path / str(device_id)
-            if not await aiofiles.os.path.exists(str(device_media_path)):
-                continue
+        if not media_lst:
+            LOGGER.debug(f"No medias found for device id = {device}")
+            return []
 
-            def list_directory(path):
-                return list(path.iterdir())
+        return [
+            (media, missing_types)
+            for media in media_lst
+            if (
+                missing_types := self.media_index.list_missing_media_types(
+                    media, self.media_type, self.event_type
+                )
+            )
+        ]
+
+    @staticmethod
+    def _download_priority(
+        media: MediaCloud, media_type: MediaType
+    ) -> tuple[bool, int, bool]:
+        """Return the download priority of a media, lowest first.
+
+        Snapshots come before videos, then the most recent media, then the
+        event types shown by the image entities.
+        """
+        return (
+            media_type != MediaType.IMAGE,
+            -(media.timestamp or 0),
+            media.event_type not in MEDIA_PRIORITY_EVENTS,
+        )
 
+    async def _async_download_worker(
+        self,
+        queue: asyncio.PriorityQueue[MediaDownload],
+        pending: Counter[int],
+        progress: MediaSyncProgress,
+    ) -> None:
+        """Download the media of the queue until it is empty.
+
+        The media table of a device is published once all its media are done.
+        """
+        downloader = PetkitMediaDownloader(
+            self.media_path, self.config_entry.runtime_data.client, progress
+        )
+        while not queue.empty():
+            _, _, media, media_type = queue.get_nowait()
             try:
-                date_dirs = await asyncio.to_thread(list_directory, device_media_path)
-            except FileNotFoundError:
-                LOGGER.warning(f"Device media path not found: {device_media_path}")
-                continue
-
-            for date_dir in date_dirs:
-                if date_dir.is_dir():
-                    try:
-                        dir_date = datetime.strptime(date_dir.name, "%Y%m%d")
-                        if dir_date < retention_date:
-                            LOGGER.debug(f"Deleting old media files in {date_dir}")
-                            await asyncio.to_thread(shutil.rmtree, date_dir)
-                    except ValueError:
-                        LOGGER.warning(
-                            f"Invalid date format in directory name: {date_dir.name}"
-                        )
+                downloaded = await self._async_download_media(
+                    downloader, media, media_type
+                )
+            except Exception as err:  # noqa: BLE001
+                # A worker must never stop with media left in the queue, the
+                # sync would end while the others keep writing their files.
+                LOGGER.error(
+                    f"Media sync failed for event id = {media.event_id} ({media_type}): {err}"
+                )
+                downloaded = False
+            if not downloaded:
+                progress.files_failed += 1
+            progress.files_done += 1
+            pending[media.device_id] -= 1
+            if not pending[media.device_id]:
+                LOGGER.debug(f"Media sync finished for device id = {media.device_id}")
+                self._refresh_media_table({media.device_id})
+                self._async_publish_media_table()
+
+    async def _async_download_media(
+        self,
+        downloader: PetkitMediaDownloader,
+        media: MediaCloud,
+        media_type: MediaType,
+    ) -> bool:
+        """Download a media, or link it to an identical one already downloaded."""
+        file_path = get_media_file_path(self.media_path, media, media_type)
+        source = get_media_source(media, media_type)
+        if source and await self.media_index.async_link_from_source(file_path, source):
+            LOGGER.debug(f"Media {file_path.name} already downloaded, linked")
+        else:
+            try:
+                await downloader.download_file(media, [media_type])
+            except (PypetkitError, aiohttp.ClientError, ValueError) as err:
+                LOGGER.error(
+                    f"Media download failed for event id = {media.event_id}: {err}"
+                )
+                return False
+            # HTTP errors and interrupted downloads are logged, not raised
+            if not await aiofiles.os.path.exists(file_path):
+                LOGGER.debug(f"Media {file_path.name} not downloaded")
+                return False
+        pet_id = self._event_pets.get(media.event_id)
+        await self.media_index.async_add_files(
+            [file_path],
+            {file_path: source} if source else None,
+            {file_path: pet_id} if pet_id else None,
+        )
+        if media_type == MediaType.IMAGE:
+            # Update the image entities without waiting for the whole backlog
+            self._async_media_index_changed({media.device_id})
+        return True
+
+    async def _async_delete_old_media(self) -> None:
+        """Delete the media files exceeding the retention policy."""
+        if changed := await self.media_retention.async_enforce(
+            self.data_coordinator.current_devices
+        ):
+            self._async_media_index_changed(changed)
 
 
 class PetkitBluetoothUpdateCoordinator(DataUpdateCoordinator):
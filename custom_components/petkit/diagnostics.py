@@ -16,4 +16,5 @@ async def async_get_device_diagnostics(
 
     return {
         "config_entry": async_redact_data(config_entry.data, TO_REDACT),
+        "media_sync": config_entry.runtime_data.coordinator_media.media_sync.as_dict(),
     }
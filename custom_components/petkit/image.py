@@ -4,11 +4,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 import datetime
+import hashlib
+from http import HTTPStatus
 from pathlib import Path
 from types import MappingProxyType
 from typing import TYPE_CHECKING, Any
 
 import aiofiles
+from aiohttp import hdrs, web
 from pypetkitapi import (
     FEEDER_WITH_CAMERA,
     LITTER_WITH_CAMERA,
@@ -18,14 +21,19 @@ from pypetkitapi import (
     WaterFountain,
 )
 
-from homeassistant.components.image import ImageEntity, ImageEntityDescription
-from homeassistant.core import callback
+from homeassistant.components.http import KEY_AUTHENTICATED, HomeAssistantView
+from homeassistant.components.image import (
+    DOMAIN as IMAGE_DOMAIN,
+    ImageEntity,
+    ImageEntityDescription,
+)
+from homeassistant.core import HomeAssistant, callback
 
-from .const import CONF_MEDIA_DL_IMAGE, LOGGER, MEDIA_SECTION
+from .const import CONF_MEDIA_DL_IMAGE, LOGGER, MEDIA_IMAGE_CACHE_SIZE, MEDIA_SECTION
 from .entity import PetKitDescSensorBase, PetkitEntity
+from .media_cache import MediaBytesCache
 
 if TYPE_CHECKING:
-    from homeassistant.core import HomeAssistant
     from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
     from .coordinator import PetkitMediaUpdateCoordinator
@@ -39,6 +47,13 @@ class PetKitImageDesc(PetKitDescSensorBase, ImageEntityDescription):
     event_key: str | None = None  # Event key to get the image from
 
 
+NO_IMAGE = (Path(__file__).parent / "img" / "no-image.png").read_bytes()
+NO_IMAGE_CONTENT_TYPE = "image/png"
+IMAGE_VIEW_URL = "/api/petkit/image"
+
+# Snapshots shown by the image entities, keyed by (path, modification time)
+IMAGE_CACHE = MediaBytesCache(MEDIA_IMAGE_CACHE_SIZE)
+
 COMMON_ENTITIES = []
 
 IMAGE_MAPPING: dict[type[PetkitDevices], list[PetKitImageDesc]] = {
@@ -120,13 +135,33 @@ class PetkitImage(PetkitEntity, ImageEntity):
         self.media_list = []
         self._attr_image_last_updated = None
         self._last_image_file: str | None = None
-        self.get_last_image()
+        self._last_image_mtime: float | None = None
+        self._last_image_checksum: str | None = None
 
+    async def async_added_to_hass(self) -> None:
+        """Get the last image when the entity is added to Home Assistant."""
+        await super().async_added_to_hass()
+        self._update_last_image()
+
+    @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
+        self._update_last_image()
         super()._handle_coordinator_update()
-        self.get_last_image()
-        self.async_write_ha_state()
+
+    @property
+    def entity_picture(self) -> str | None:
+        """Return a link to the image served by the Petkit image view.
+
+        The image is downscaled to the largest configured width, its update
+        time changing the link once the image changed.
+        """
+        url = f"{IMAGE_VIEW_URL}/{self.entity_id}?token={self.access_tokens[-1]}"
+        if self.coordinator.image_widths:
+            url += f"&width={self.coordinator.image_widths[-1]}"
+        if self.image_last_updated is not None:
+            url += f"&time={int(self.image_last_updated.timestamp())}"
+        return url
 
     @property
     def unique_id(self) -> str:
@@ -143,50 +178,94 @@ class PetkitImage(PetkitEntity, ImageEntity):
         return False
 
     @callback
-    def get_last_image(self):
-        """Get the last image filename"""
+    def _update_last_image(self) -> None:
+        """Get the last image filename from the media index"""
         event_key = self.entity_description.event_key
-        media_table = self.coordinator.media_table
+        media_index = self.coordinator.media_index
 
-        # Filter media files by device_id and event_key
-        matching_media_files = [
-            media_file
-            for media_file in media_table.get(self.device.id, [])
-            if media_file.event_type == event_key
-        ]
+        latest_entry = media_index.get_latest_snapshot(self.device.id, event_key)
 
-        if not matching_media_files:
+        if latest_entry is None:
             LOGGER.info(
                 f"No media files found for device id = {self.device.id} and event key = {event_key}"
             )
             self._attr_image_last_updated = None
             self._last_image_file = None
-            return
-
-        # Find the media file with the most recent timestamp
-        latest_media_file = max(
-            matching_media_files, key=lambda media_file: media_file.timestamp
-        )
-
-        image_path = latest_media_file.full_file_path
-        self._attr_image_last_updated = datetime.datetime.fromtimestamp(
-            latest_media_file.timestamp
-        )
-        self._last_image_file = image_path
+            self._last_image_mtime = None
+            self._last_image_checksum = None
+        else:
+            self._attr_image_last_updated = datetime.datetime.fromtimestamp(
+                latest_entry.timestamp
+            )
+            self._last_image_file = str(media_index.media_path / latest_entry.path)
+            self._last_image_mtime = latest_entry.mtime
+            self._last_image_checksum = latest_entry.checksum
 
     async def async_image(self) -> bytes | None:
         """Return bytes of image asynchronously."""
-        no_img = Path(__file__).parent / "img" / "no-image.png"
-
         if not self._last_image_file:
             LOGGER.error("No media files found")
             self._attr_image_last_updated = None
-            return await self._read_file(no_img)
+            return NO_IMAGE
+
+        key = (self._last_image_file, self._last_image_mtime)
+        if (image := IMAGE_CACHE.get(key)) is not None:
+            return image
 
         LOGGER.debug(
             f"Getting image for {self.device.device_nfo.device_type} Path is :{self._last_image_file}"
         )
-        return await self._read_file(self._last_image_file)
+        image = await self._read_file(self._last_image_file)
+        if image is not None:
+            IMAGE_CACHE.put(key, image)
+        return image
+
+    async def async_image_variant(self, width: int) -> tuple[bytes, str] | None:
+        """Return the bytes and content type of the image downscaled for a width.
+
+        The image is downscaled to the smallest configured width not below the
+        requested one, the full image being returned if there is none.
+        """
+        if not self._last_image_file:
+            return NO_IMAGE, NO_IMAGE_CONTENT_TYPE
+
+        if (variant_width := self._get_variant_width(width)) is None:
+            image = await self.async_image()
+            return None if image is None else (image, self.content_type)
+
+        key = (self._last_image_file, self._last_image_mtime, variant_width)
+        if (image := IMAGE_CACHE.get(key)) is None:
+            image = await self.coordinator.media_thumbnails.async_resize(
+                Path(self._last_image_file), variant_width
+            )
+            if image is None:
+                return None
+            IMAGE_CACHE.put(key, image)
+        return image, self.content_type
+
+    def image_etag(self, width: int) -> str:
+        """Return the strong ETag of the image served for a width.
+
+        It is derived from the checksum of the image, or from its path and
+        modification time while its checksum is not known yet.
+        """
+        if not self._last_image_file:
+            return "no-image"
+        identity = (
+            self._last_image_checksum
+            or hashlib.sha256(
+                f"{self._last_image_file}:{self._last_image_mtime}".encode()
+            ).hexdigest()
+        )
+        return f"{identity}-{self._get_variant_width(width) or 0}"
+
+    def _get_variant_width(self, width: int) -> int | None:
+        """Return the configured width an image is downscaled to, None for none."""
+        if not width:
+            return None
+        return next(
+            (size for size in self.coordinator.image_widths if size >= width), None
+        )
 
     @staticmethod
     async def _read_file(image_path) -> bytes | None:
@@ -196,3 +275,49 @@ class PetkitImage(PetkitEntity, ImageEntity):
         except FileNotFoundError:
             LOGGER.error("Unable to read image file")
             return None
+
+
+class PetkitImageView(HomeAssistantView):
+    """Serve the image of an image entity, downscaled to the requested width.
+
+    Requests are authenticated like the image proxy: either with a valid
+    session, or with the access token of the entity. Responses carry a strong
+    ETag, clients already having the image get a 304 Not Modified.
+    """
+
+    url = f"{IMAGE_VIEW_URL}/{{entity_id}}"
+    name = "api:petkit:image"
+    requires_auth = False
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the image view."""
+        self.hass = hass
+
+    async def get(self, request: web.Request, entity_id: str) -> web.Response:
+        """Serve an image."""
+        component = self.hass.data.get(IMAGE_DOMAIN)
+        entity = component.get_entity(entity_id) if component else None
+        if not isinstance(entity, PetkitImage):
+            raise web.HTTPNotFound
+
+        if not request[KEY_AUTHENTICATED] and (
+            request.query.get("token") not in entity.access_tokens
+        ):
+            raise web.HTTPUnauthorized
+
+        try:
+            width = int(request.query.get("width", 0))
+        except ValueError as err:
+            raise web.HTTPBadRequest from err
+
+        etag = entity.image_etag(width)
+        headers = {hdrs.CACHE_CONTROL: "no-cache", hdrs.ETAG: f'"{etag}"'}
+        if request.if_none_match and any(
+            tag.value in (etag, "*") for tag in request.if_none_match
+        ):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+        if (variant := await entity.async_image_variant(width)) is None:
+            raise web.HTTPNotFound
+        image, content_type = variant
+        return web.Response(body=image, content_type=content_type, headers=headers)
@@ -0,0 +1,38 @@
+"""In-memory cache of media bytes for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable
+
+
+class MediaBytesCache:
+    """Least recently used cache of media bytes, bounded by their total size.
+
+    Keys must change with the content, e.g. hold the modification time of the
+    file the bytes were read from.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize the cache, max_size being in bytes."""
+        self.max_size = max_size
+        self.size = 0
+        self._cache: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def get(self, key: Hashable) -> bytes | None:
+        """Return the cached bytes of a key."""
+        if (data := self._cache.get(key)) is not None:
+            self._cache.move_to_end(key)
+        return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        """Cache the bytes of a key, evicting the least recently used ones."""
+        if len(data) > self.max_size:
+            return
+        if (previous := self._cache.pop(key, None)) is not None:
+            self.size -= len(previous)
+        self._cache[key] = data
+        self.size += len(data)
+        while self.size > self.max_size:
+            _, evicted = self._cache.popitem(last=False)
+            self.size -= len(evicted)
@@ -0,0 +1,740 @@
+"""Persistent SQLite catalog of the media files for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import LOGGER
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+CATALOG_FILENAME = "petkit_media.{entry_id}.db"  # In the Home Assistant storage
+LEGACY_CATALOG_FILENAME = ".petkit_media.db"  # Formerly in the media path
+CATALOG_VERSION = 8
+SQLITE_SUFFIXES = ("", "-wal", "-shm")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    device_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    record_type TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    checksum TEXT,
+    has_snapshot INTEGER NOT NULL DEFAULT 0,
+    has_video INTEGER NOT NULL DEFAULT 0,
+    last_access REAL,
+    source TEXT,
+    has_thumbnail INTEGER NOT NULL DEFAULT 0,
+    faststart INTEGER NOT NULL DEFAULT 0,
+    pet_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_media_event
+    ON media (device_id, event_type, record_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_media_day
+    ON media (device_id, day, event_type, record_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_media_source ON media (source);
+CREATE INDEX IF NOT EXISTS idx_media_timestamp ON media (timestamp);
+CREATE INDEX IF NOT EXISTS idx_media_event_type ON media (event_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_media_pet ON media (pet_id, timestamp);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Schema changes from the previous version, catalogs older than the first
+# migrated version cannot be migrated
+_MIGRATIONS: dict[int, str] = {
+    8: """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+""",
+}
+_FIRST_MIGRATED_VERSION = min(_MIGRATIONS) - 1
+
+_COLUMNS = (
+    "path, device_id, event_type, record_type, timestamp, day, size, mtime, "
+    "checksum, has_snapshot, has_video, last_access, source, has_thumbnail, "
+    "faststart, pet_id"
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class CatalogEntry:
+    """A media file recorded into the catalog."""
+
+    path: str  # Relative to the media path
+    device_id: int
+    event_type: str
+    record_type: str  # "snapshot" or "video"
+    timestamp: int
+    day: str
+    size: int
+    mtime: float
+    checksum: str | None = None
+    has_snapshot: bool = False
+    has_video: bool = False
+    last_access: float | None = None
+    source: str | None = None  # URL the media was downloaded from
+    has_thumbnail: bool = False
+    faststart: bool = False  # Video whose moov atom is before its media data
+    pet_id: str | None = None  # Pet recognized by the device during the event
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> CatalogEntry:
+        """Create an entry from a database row."""
+        return cls(
+            path=row["path"],
+            device_id=row["device_id"],
+            event_type=row["event_type"],
+            record_type=row["record_type"],
+            timestamp=row["timestamp"],
+            day=row["day"],
+            size=row["size"],
+            mtime=row["mtime"],
+            checksum=row["checksum"],
+            has_snapshot=bool(row["has_snapshot"]),
+            has_video=bool(row["has_video"]),
+            last_access=row["last_access"],
+            source=row["source"],
+            has_thumbnail=row["has_thumbnail"] > 0,
+            faststart=row["faststart"] > 0,
+            pet_id=row["pet_id"],
+        )
+
+
+def get_catalog_path(hass: HomeAssistant, entry_id: str) -> Path:
+    """Return the path of the catalog of a config entry."""
+    return Path(
+        hass.config.path(STORAGE_DIR, CATALOG_FILENAME.format(entry_id=entry_id))
+    )
+
+
+def remove_catalog(db_path: Path) -> None:
+    """Remove the files of a catalog (blocking I/O)."""
+    for suffix in SQLITE_SUFFIXES:
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+
+class PetkitMediaCatalog:
+    """SQLite catalog of the media files stored under the media path.
+
+    The catalog is stored on the Home Assistant storage, not in the media path
+    which may be a network share where SQLite cannot lock its files. Errors
+    of the database are logged, a failed query returning no rows.
+
+    All the methods are blocking and must be run in the executor.
+    """
+
+    def __init__(self, db_path: Path, media_path: Path) -> None:
+        """Initialize the catalog of the media files of a media path."""
+        self.db_path = db_path
+        self.media_path = media_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        """Open the catalog, creating or migrating it if needed."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._import_legacy()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            self._migrate(conn)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._check_media_path(conn)
+        except sqlite3.Error:
+            conn.close()
+            raise
+
+        self._conn = conn
+
+    def _import_legacy(self) -> None:
+        """Move the catalog formerly stored in the media path, if any."""
+        legacy_path = self.media_path / LEGACY_CATALOG_FILENAME
+        if self.db_path.exists() or not legacy_path.exists():
+            return
+        try:
+            legacy = sqlite3.connect(legacy_path)
+            try:
+                version = legacy.execute("PRAGMA user_version").fetchone()[0]
+                if version >= _FIRST_MIGRATED_VERSION:
+                    LOGGER.debug(
+                        f"Moving media catalog {legacy_path} to {self.db_path}"
+                    )
+                    target = sqlite3.connect(self.db_path)
+                    with target:
+                        legacy.backup(target)
+                    target.close()
+            finally:
+                legacy.close()
+            remove_catalog(legacy_path)
+        except (OSError, sqlite3.Error) as err:
+            LOGGER.warning(f"Unable to move media catalog {legacy_path}: {err}")
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Create the schema, or migrate it to the current version."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            LOGGER.debug("Creating media catalog")
+            conn.executescript(
+                f"BEGIN; {_SCHEMA} PRAGMA user_version = {CATALOG_VERSION}; COMMIT;"
+            )
+            return
+        if version > CATALOG_VERSION:
+            # Columns are always named, newer catalogs remain usable
+            LOGGER.debug(f"Media catalog version {version} is newer than expected")
+            return
+        if version < _FIRST_MIGRATED_VERSION:
+            raise sqlite3.DatabaseError(f"Unsupported media catalog version {version}")
+        for target in range(version + 1, CATALOG_VERSION + 1):
+            LOGGER.debug(f"Migrating media catalog to version {target}")
+            conn.executescript(
+                f"BEGIN; {_MIGRATIONS[target]} PRAGMA user_version = {target}; COMMIT;"
+            )
+
+    def _check_media_path(self, conn: sqlite3.Connection) -> None:
+        """Clear the catalog if it was recorded for another media path."""
+        media_path = str(self.media_path)
+        row = conn.execute(
+            "SELECT value FROM settings WHERE key = 'media_path'"
+        ).fetchone()
+        with conn:
+            if row is not None and row["value"] != media_path:
+                LOGGER.debug(f"Media path changed to {media_path}, clearing catalog")
+                conn.execute("DELETE FROM media")
+                conn.execute("DELETE FROM directories")
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('media_path', ?)",
+                (media_path,),
+            )
+
+    def close(self) -> None:
+        """Close the catalog."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection | None]:
+        """Hold the lock within a transaction, yield None if the catalog is closed.
+
+        A failed transaction is rolled back and logged.
+        """
+        with self._lock:
+            if self._conn is None:
+                yield None
+                return
+            try:
+                with self._conn:
+                    yield self._conn
+            except sqlite3.Error as err:
+                LOGGER.error(f"Unable to update the media catalog: {err}")
+
+    def _query(self, sql: str, params: Iterable = ()) -> list[sqlite3.Row]:
+        """Run a read query, return no rows if it failed."""
+        with self._lock:
+            if self._conn is None:
+                return []
+            try:
+                return self._conn.execute(sql, tuple(params)).fetchall()
+            except sqlite3.Error as err:
+                LOGGER.error(f"Unable to query the media catalog: {err}")
+                return []
+
+    def upsert(self, entries: Iterable[CatalogEntry]) -> None:
+        """Insert or update entries.
+
+        The source and pet of an entry are kept when updated without them.
+        """
+        entries = list(entries)
+        with self._transaction() as conn:
+            if conn is None or not entries:
+                return
+            conn.executemany(
+                f"INSERT INTO media ({_COLUMNS}) "  # noqa: S608
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, ?, ?, 0, 0, ?) "
+                "ON CONFLICT (path) DO UPDATE SET "
+                "device_id = excluded.device_id, event_type = excluded.event_type, "
+                "record_type = excluded.record_type, timestamp = excluded.timestamp, "
+                "day = excluded.day, size = excluded.size, mtime = excluded.mtime, "
+                "checksum = excluded.checksum, has_snapshot = 0, has_video = 0, "
+                "last_access = excluded.last_access, "
+                "source = COALESCE(excluded.source, source), "
+                "has_thumbnail = 0, faststart = 0, "
+                "pet_id = COALESCE(excluded.pet_id, pet_id)",
+                [
+                    (
+                        entry.path,
+                        entry.device_id,
+                        entry.event_type,
+                        entry.record_type,
+                        entry.timestamp,
+                        entry.day,
+                        entry.size,
+                        entry.mtime,
+                        entry.checksum,
+                        entry.last_access,
+                        entry.source,
+                        entry.pet_id,
+                    )
+                    for entry in entries
+                ],
+            )
+            self._refresh_presence(
+                conn,
+                [
+                    (entry.device_id, entry.event_type, entry.timestamp)
+                    for entry in entries
+                ],
+            )
+
+    def delete(self, paths: Iterable[str]) -> None:
+        """Delete the entries of paths."""
+        paths = [(path,) for path in paths]
+        with self._transaction() as conn:
+            if conn is None or not paths:
+                return
+            events = [
+                tuple(row)
+                for path in paths
+                for row in conn.execute(
+                    "SELECT device_id, event_type, timestamp FROM media "
+                    "WHERE path = ?",
+                    path,
+                )
+            ]
+            conn.executemany("DELETE FROM media WHERE path = ?", paths)
+            self._refresh_presence(conn, events)
+
+    @staticmethod
+    def _refresh_presence(
+        conn: sqlite3.Connection, events: list[tuple[int, str, int]]
+    ) -> None:
+        """Update the snapshot/video/thumbnail flags of (device, event type, timestamp).
+
+        A failed thumbnail generation (-1) is kept, not to be attempted again.
+        """
+        conn.executemany(
+            """
+            UPDATE media SET
+                has_snapshot = EXISTS (
+                    SELECT 1 FROM media m WHERE m.device_id = media.device_id
+                    AND m.event_type = media.event_type
+                    AND m.timestamp = media.timestamp
+                    AND m.record_type = 'snapshot'
+                ),
+                has_video = EXISTS (
+                    SELECT 1 FROM media m WHERE m.device_id = media.device_id
+                    AND m.event_type = media.event_type
+                    AND m.timestamp = media.timestamp
+                    AND m.record_type = 'video'
+                ),
+                has_thumbnail = COALESCE((
+                    SELECT m.has_thumbnail FROM media m
+                    WHERE m.device_id = media.device_id
+                    AND m.event_type = media.event_type
+                    AND m.timestamp = media.timestamp
+                    AND m.record_type = 'snapshot' AND m.has_thumbnail != 0
+                    ORDER BY m.has_thumbnail DESC LIMIT 1
+                ), 0)
+            WHERE device_id = ? AND event_type = ? AND timestamp = ?
+            """,
+            set(events),
+        )
+
+    def set_checksum(self, path: str, checksum: str) -> None:
+        """Record the checksum of an entry."""
+        with self._transaction() as conn:
+            if conn is not None:
+                conn.execute(
+                    "UPDATE media SET checksum = ? WHERE path = ?", (checksum, path)
+                )
+
+    def set_thumbnails(self, paths: Iterable[str], generated: bool) -> None:
+        """Flag the events of snapshots whose thumbnail generation was attempted.
+
+        Failed generations are flagged -1, not to be attempted again.
+        """
+        params = [(1 if generated else -1, path) for path in paths]
+        with self._transaction() as conn:
+            if conn is not None and params:
+                conn.executemany(
+                    "UPDATE media SET has_thumbnail = ? "
+                    "WHERE (device_id, event_type, timestamp) = ("
+                    "SELECT device_id, event_type, timestamp FROM media WHERE path = ?)",
+                    params,
+                )
+
+    def set_faststart(
+        self,
+        path: str,
+        done: bool,
+        size: int | None = None,
+        mtime: float | None = None,
+    ) -> None:
+        """Flag a video whose faststart rewrite was attempted.
+
+        A rewritten video gets its new size and modification time, its checksum
+        being computed again. Failed rewrites are flagged -1, not to be
+        attempted again.
+        """
+        with self._transaction() as conn:
+            if conn is None:
+                return
+            conn.execute(
+                "UPDATE media SET faststart = ? WHERE path = ?",
+                (1 if done else -1, path),
+            )
+            if size is not None and mtime is not None:
+                conn.execute(
+                    "UPDATE media SET size = ?, mtime = ?, checksum = NULL "
+                    "WHERE path = ?",
+                    (size, mtime, path),
+                )
+
+    def set_last_access(self, path: str, last_access: float) -> None:
+        """Record the last time an entry was viewed."""
+        with self._transaction() as conn:
+            if conn is not None:
+                conn.execute(
+                    "UPDATE media SET last_access = ? WHERE path = ?",
+                    (last_access, path),
+                )
+
+    def directory_mtimes(self) -> dict[str, float]:
+        """Return the modification times of the media directories at last scan."""
+        return {
+            row["path"]: row["mtime"]
+            for row in self._query("SELECT path, mtime FROM directories")
+        }
+
+    def set_directory_mtime(self, path: str, mtime: float) -> None:
+        """Record the modification time of a media directory."""
+        with self._transaction() as conn:
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO directories (path, mtime) VALUES (?, ?)",
+                    (path, mtime),
+                )
+
+    def delete_directory(self, path: str) -> None:
+        """Forget a media directory."""
+        with self._transaction() as conn:
+            if conn is not None:
+                conn.execute("DELETE FROM directories WHERE path = ?", (path,))
+
+    def get(self, path: str) -> CatalogEntry | None:
+        """Return the entry of a path."""
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM media WHERE path = ?",  # noqa: S608
+            (path,),
+        )
+        return CatalogEntry.from_row(rows[0]) if rows else None
+
+    def all_entries(self) -> list[CatalogEntry]:
+        """Return all the entries."""
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(f"SELECT {_COLUMNS} FROM media")  # noqa: S608
+        ]
+
+    def entries_without_thumbnail(self, limit: int) -> list[CatalogEntry]:
+        """Return the most recent snapshots whose thumbnail is not generated yet."""
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+                "WHERE record_type = 'snapshot' AND has_thumbnail = 0 "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (limit,),
+            )
+        ]
+
+    def entries_without_faststart(self, limit: int) -> list[CatalogEntry]:
+        """Return the most recent videos whose faststart rewrite is not attempted yet."""
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+                "WHERE record_type = 'video' AND faststart = 0 "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (limit,),
+            )
+        ]
+
+    def find_by_source(self, source: str) -> CatalogEntry | None:
+        """Return an entry downloaded from a source, whose checksum is known."""
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+            "WHERE source = ? AND checksum IS NOT NULL LIMIT 1",
+            (source,),
+        )
+        return CatalogEntry.from_row(rows[0]) if rows else None
+
+    def entries_without_checksum(self, limit: int) -> list[CatalogEntry]:
+        """Return entries whose checksum has not been computed yet."""
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media WHERE checksum IS NULL LIMIT ?",  # noqa: S608
+                (limit,),
+            )
+        ]
+
+    def entries_before(self, day: str) -> list[CatalogEntry]:
+        """Return the entries of the days before a day."""
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media WHERE day < ?",  # noqa: S608
+                (day,),
+            )
+        ]
+
+    def usage(self, record_type: str, since_day: str | None = None) -> dict[int, int]:
+        """Return the size of the entries of a record type of each device."""
+        return {
+            row["device_id"]: row["total"]
+            for row in self._query(
+                "SELECT device_id, SUM(size) AS total FROM media "
+                "WHERE record_type = ? AND (? IS NULL OR day >= ?) GROUP BY device_id",
+                (record_type, since_day, since_day),
+            )
+        }
+
+    def eviction_candidates(
+        self,
+        record_type: str,
+        least_accessed: bool,
+        *,
+        device_id: int | None = None,
+        since_day: str | None = None,
+        batch_size: int,
+    ) -> Iterator[CatalogEntry]:
+        """Iterate over the entries of a record type, the first to evict first.
+
+        Entries are ordered by age, or by last access (falling back to the
+        modification time of the entries never viewed), then by path. They are
+        fetched a batch at a time, as only the first ones are usually evicted.
+        """
+        order = "COALESCE(last_access, mtime)" if least_accessed else "timestamp"
+        after_order: float | None = None
+        after_path: str | None = None
+        while True:
+            rows = self._query(
+                f"SELECT {_COLUMNS}, {order} AS eviction_order "  # noqa: S608
+                "FROM media WHERE record_type = ? "
+                "AND (? IS NULL OR device_id = ?) AND (? IS NULL OR day >= ?) "
+                f"AND (? IS NULL OR ({order}, path) > (?, ?)) "
+                f"ORDER BY {order}, path LIMIT ?",
+                (
+                    record_type,
+                    device_id,
+                    device_id,
+                    since_day,
+                    since_day,
+                    after_order,
+                    after_order,
+                    after_path,
+                    batch_size,
+                ),
+            )
+            yield from (CatalogEntry.from_row(row) for row in rows)
+            if len(rows) < batch_size:
+                return
+            after_order, after_path = rows[-1]["eviction_order"], rows[-1]["path"]
+
+    def latest(
+        self, device_id: int, event_type: str, record_type: str
+    ) -> CatalogEntry | None:
+        """Return the most recent entry of a device for an event type."""
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+            "WHERE device_id = ? AND event_type = ? AND record_type = ? "
+            "ORDER BY timestamp DESC LIMIT 1",
+            (device_id, event_type, record_type),
+        )
+        return CatalogEntry.from_row(rows[0]) if rows else None
+
+    def list_devices(self) -> list[int]:
+        """Return the devices having media."""
+        return [
+            row["device_id"]
+            for row in self._query(
+                "SELECT DISTINCT device_id FROM media ORDER BY device_id"
+            )
+        ]
+
+    def list_pets(self) -> list[str]:
+        """Return the pets having media."""
+        return [
+            row["pet_id"]
+            for row in self._query(
+                "SELECT DISTINCT pet_id FROM media "
+                "WHERE pet_id IS NOT NULL ORDER BY pet_id"
+            )
+        ]
+
+    def list_all_event_types(self) -> list[str]:
+        """Return the event types having media, for all devices."""
+        return [
+            row["event_type"]
+            for row in self._query(
+                "SELECT DISTINCT event_type FROM media ORDER BY event_type"
+            )
+        ]
+
+    def search(
+        self,
+        *,
+        since: int | None = None,
+        event_type: str | None = None,
+        pet_id: str | None = None,
+        before: tuple[int, str] | None = None,
+        limit: int = -1,
+    ) -> list[CatalogEntry]:
+        """Return the events matching the criteria, most recent first.
+
+        Each event is returned once, as its video if any, else as its snapshot.
+        Events of different devices may share a timestamp, they are ordered by
+        (timestamp, path), before being the last (timestamp, path) of a page.
+        """
+        clauses = ["(record_type = 'video' OR has_video = 0)"]
+        params: list = []
+        for clause, value in (
+            ("timestamp >= ?", since),
+            ("event_type = ?", event_type),
+            ("pet_id = ?", pet_id),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if before is not None:
+            clauses.append("timestamp <= ? AND (timestamp < ? OR path < ?)")
+            params.extend((before[0], *before))
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+                f"WHERE {' AND '.join(clauses)} "
+                "ORDER BY timestamp DESC, path DESC LIMIT ?",
+                [*params, limit],
+            )
+        ]
+
+    def export_entries(
+        self,
+        *,
+        device_ids: list[int] | None = None,
+        start_day: str | None = None,
+        end_day: str | None = None,
+        event_types: list[str] | None = None,
+        after: str | None = None,
+        limit: int = -1,
+    ) -> list[CatalogEntry]:
+        """Return the entries matching the criteria, ordered by path after a path."""
+        clauses = ["1"]
+        params: list = []
+        for column, values in (("device_id", device_ids), ("event_type", event_types)):
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        for clause, value in (
+            ("day >= ?", start_day),
+            ("day <= ?", end_day),
+            ("path > ?", after),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+                f"WHERE {' AND '.join(clauses)} ORDER BY path LIMIT ?",
+                [*params, limit],
+            )
+        ]
+
+    def list_days(
+        self, device_id: int, before: str | None = None, limit: int = -1
+    ) -> list[str]:
+        """Return the days having media for a device, most recent first."""
+        return [
+            row["day"]
+            for row in self._query(
+                "SELECT DISTINCT day FROM media WHERE device_id = ? "
+                "AND (? IS NULL OR day < ?) ORDER BY day DESC LIMIT ?",
+                (device_id, before, before, limit),
+            )
+        ]
+
+    def list_event_types(self, device_id: int, day: str) -> list[str]:
+        """Return the event types having media for a device and a day."""
+        return [
+            row["event_type"]
+            for row in self._query(
+                "SELECT DISTINCT event_type FROM media "
+                "WHERE device_id = ? AND day = ? ORDER BY event_type",
+                (device_id, day),
+            )
+        ]
+
+    def list_record_types(self, device_id: int, day: str, event_type: str) -> list[str]:
+        """Return the record types having media for a device, a day and an event type."""
+        return [
+            row["record_type"]
+            for row in self._query(
+                "SELECT DISTINCT record_type FROM media "
+                "WHERE device_id = ? AND day = ? AND event_type = ? "
+                "ORDER BY record_type",
+                (device_id, day, event_type),
+            )
+        ]
+
+    def list_files(
+        self,
+        device_id: int,
+        day: str,
+        event_type: str,
+        record_type: str,
+        before: int | None = None,
+        limit: int = -1,
+    ) -> list[CatalogEntry]:
+        """Return the entries of a device, a day, an event type and a record type.
+
+        Entries are returned most recent first, starting before a timestamp.
+        """
+        return [
+            CatalogEntry.from_row(row)
+            for row in self._query(
+                f"SELECT {_COLUMNS} FROM media "  # noqa: S608
+                "WHERE device_id = ? AND day = ? AND event_type = ? "
+                "AND record_type = ? AND (? IS NULL OR timestamp < ?) "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (device_id, day, event_type, record_type, before, before, limit),
+            )
+        ]
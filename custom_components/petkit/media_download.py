@@ -0,0 +1,236 @@
+"""Resumable download of the media files for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+import asyncio
+from http import HTTPStatus
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+import aiohttp
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+from pypetkitapi import DownloadDecryptMedia, MediaType, PetKitClient
+
+from .const import LOGGER, MEDIA_DOWNLOAD_CHUNK_SIZE, MEDIA_DOWNLOAD_TIMEOUT
+from .media_sync import MediaSyncProgress
+
+PART_SUFFIX = ".part"
+TMP_SUFFIX = ".tmp"
+MEDIA_AES_IV = b"a" * 16
+
+
+def get_temp_path(file_path: Path, suffix: str) -> Path:
+    """Return the path of a temporary file next to a media file."""
+    return file_path.with_name(f"{file_path.name}{suffix}")
+
+
+class PetkitMediaDownloader(DownloadDecryptMedia):
+    """Download and decrypt media files, resuming interrupted downloads.
+
+    The content is decrypted while streaming into a ".part" file next to the
+    media file, an interrupted download is resumed with an HTTP Range request.
+    The media file only appears, through an atomic rename, once complete.
+    """
+
+    def __init__(
+        self,
+        download_path: Path,
+        client: PetKitClient,
+        progress: MediaSyncProgress | None = None,
+    ) -> None:
+        """Initialize the downloader, the sync progress counting the bytes written."""
+        super().__init__(download_path, client)
+        self.progress = progress
+
+    def _add_bytes(self, size: int) -> None:
+        """Count bytes written into the sync progress."""
+        if self.progress is not None:
+            self.progress.bytes_done += size
+
+    async def _get_video_m3u8(self) -> None:
+        """Download the video segments, concatenate them once all are downloaded."""
+        aes_key, iv_key, segments_lst = await self._get_m3u8_segments()
+        file_name = (
+            f"{self.file_data.device_id}_{self.file_data.timestamp}.{MediaType.VIDEO}"
+        )
+
+        if aes_key is None or iv_key is None or not segments_lst:
+            LOGGER.debug(f"Can't download video file {file_name}")
+            return
+
+        if len(segments_lst) == 1:
+            await self._get_file(segments_lst[0], aes_key, file_name)
+            return
+
+        results = await asyncio.gather(
+            *(
+                self._get_file(segment, aes_key, f"{index}_{file_name}")
+                for index, segment in enumerate(segments_lst, start=1)
+            )
+        )
+        if not all(results):
+            LOGGER.debug(
+                f"Video {file_name} is incomplete, its segments will be resumed"
+            )
+            return
+
+        segment_files = [
+            await self.get_fpath(f"{index}_{file_name}")
+            for index in range(1, len(segments_lst) + 1)
+        ]
+        LOGGER.debug(f"Concatenating video with {len(segment_files)} segments")
+        await self._concat_segments(segment_files, file_name)
+
+    async def _get_file(
+        self, url: str | None, aes_key: str | None, full_filename: str | None
+    ) -> bool:
+        """Download a file from a URL and decrypt it."""
+        if not url or not aes_key or not full_filename:
+            LOGGER.debug("Missing URL, AES key, or filename")
+            return False
+
+        file_path = await self.get_fpath(full_filename)
+        if await aiofiles.os.path.exists(file_path):
+            # Segment kept from a previous video download
+            return True
+
+        part_path = get_temp_path(file_path, PART_SUFFIX)
+        try:
+            await aiofiles.os.makedirs(file_path.parent, exist_ok=True)
+            if not await self._download_part(url, aes_key, part_path):
+                return False
+            await aiofiles.os.replace(part_path, file_path)
+        except (
+            aiohttp.ClientError,
+            asyncio.IncompleteReadError,
+            TimeoutError,
+            OSError,
+        ) as err:
+            LOGGER.warning(
+                f"Download of {file_path.name} interrupted, it will be resumed: {err}"
+            )
+            return False
+        LOGGER.debug(f"Save file OK : {file_path}")
+        return True
+
+    async def _download_part(self, url: str, aes_key: str, part_path: Path) -> bool:
+        """Download and decrypt the content into the part file, resuming it if any.
+
+        The content is decrypted while streaming, only the last decrypted block
+        is held back to remove its padding at the end. As the part file holds
+        whole blocks, a download is resumed from the last encrypted block
+        already received, which is the CBC IV of the next one.
+        """
+        offset = 0
+        if await aiofiles.os.path.exists(part_path):
+            offset = (await aiofiles.os.stat(part_path)).st_size
+            offset -= offset % AES.block_size
+        range_start = offset - AES.block_size
+        headers = {"Range": f"bytes={range_start}-"} if offset else {}
+
+        async with self.client.aiohttp_session.get(
+            url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=MEDIA_DOWNLOAD_TIMEOUT),
+        ) as response:
+            if offset and response.status == HTTPStatus.PARTIAL_CONTENT:
+                if not response.headers.get("Content-Range", "").startswith(
+                    f"bytes {range_start}-"
+                ):
+                    LOGGER.debug(f"Unexpected range for {url}, restarting download")
+                    await aiofiles.os.remove(part_path)
+                    return False
+                LOGGER.debug(f"Resuming download of {part_path.name} at {offset}")
+                iv = await response.content.readexactly(AES.block_size)
+                mode = "r+b"
+            elif response.status == HTTPStatus.OK:
+                offset = 0
+                iv = MEDIA_AES_IV
+                mode = "wb"
+            else:
+                LOGGER.error(
+                    f"Failed to download {url}, status code: {response.status}"
+                )
+                return False
+
+            cipher = AES.new(
+                aes_key.removesuffix("\n").encode("utf-8"), AES.MODE_CBC, iv
+            )
+            pending = b""  # Encrypted bytes not forming a whole block yet
+            last_block = b""  # Decrypted block held back for unpadding
+            async with aiofiles.open(part_path, mode) as file:
+                if offset:
+                    await file.seek(offset)
+                    await file.truncate()
+                async for chunk in response.content.iter_chunked(
+                    MEDIA_DOWNLOAD_CHUNK_SIZE
+                ):
+                    data = pending + chunk
+                    size = len(data) - len(data) % AES.block_size
+                    pending = data[size:]
+                    if not size:
+                        continue
+                    decrypted = last_block + cipher.decrypt(data[:size])
+                    last_block = decrypted[-AES.block_size :]
+                    await file.write(decrypted[: -AES.block_size])
+                    self._add_bytes(len(decrypted) - AES.block_size)
+
+                if pending:
+                    LOGGER.debug(f"Ignoring {len(pending)} trailing bytes of {url}")
+                try:
+                    last_block = unpad(last_block, AES.block_size)
+                except ValueError as err:
+                    LOGGER.debug(f"Ignoring unpad warning : {err}")
+                await file.write(last_block)
+                self._add_bytes(len(last_block))
+        return True
+
+    async def _concat_segments(self, ts_files: list[Path], output_file) -> None:
+        """Concatenate the video segments into a temporary file, then rename it."""
+        full_output_file = await self.get_fpath(output_file)
+        if await aiofiles.os.path.exists(full_output_file):
+            LOGGER.debug(f"Output file already exists: {output_file}")
+            await self._delete_segments(ts_files)
+            return
+
+        tmp_output_file = get_temp_path(full_output_file, TMP_SUFFIX)
+        concat_input = "|".join(str(file) for file in ts_files)
+        command = [
+            "ffmpeg",
+            "-y",
+            "-i",
+            f"concat:{concat_input}",
+            "-c",
+            "copy",
+            "-bsf:a",
+            "aac_adtstoasc",
+            "-f",
+            "mp4",
+            str(tmp_output_file),
+        ]
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await process.communicate()
+            if process.returncode != 0:
+                LOGGER.error(
+                    f"Error during concatenation: {process.returncode}\n"
+                    f"Stdout: {stdout.decode().strip()}\n"
+                    f"Stderr: {stderr.decode().strip()}"
+                )
+                if await aiofiles.os.path.exists(tmp_output_file):
+                    await aiofiles.os.remove(tmp_output_file)
+                return
+            await aiofiles.os.replace(tmp_output_file, full_output_file)
+        except OSError as err:
+            LOGGER.error(f"Error during concatenation: {err}")
+            return
+
+        LOGGER.debug(f"File successfully concatenated: {full_output_file}")
+        await self._delete_segments(ts_files)
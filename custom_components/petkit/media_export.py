@@ -0,0 +1,105 @@
+"""Export of the media files into archives for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import tarfile
+import zipfile
+
+from .const import LOGGER, MEDIA_EXPORT_BATCH_SIZE
+from .media_catalog import CatalogEntry, PetkitMediaCatalog
+
+ARCHIVE_TAR = "tar"
+ARCHIVE_ZIP = "zip"
+ARCHIVE_FORMATS = [ARCHIVE_TAR, ARCHIVE_ZIP]
+PART_SUFFIX = ".part"
+
+type AddToArchive = Callable[[Path, str], None]
+
+
+@dataclass(frozen=True, kw_only=True)
+class MediaExportFilter:
+    """Media to export, days are formatted YYYYMMDD (None = no filter)."""
+
+    device_ids: list[int] | None = None
+    start_day: str | None = None
+    end_day: str | None = None
+    event_types: list[str] | None = None
+
+
+@contextmanager
+def _open_archive(path: Path, archive_format: str) -> Iterator[AddToArchive]:
+    """Open an archive, yield the function adding a file to it.
+
+    Media are already compressed, they are stored as is. Files are copied
+    into the archive by chunks, never loaded in memory.
+    """
+    if archive_format == ARCHIVE_ZIP:
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+            yield archive.write
+    else:
+        with tarfile.open(path, "w") as archive:
+            # Deduplicated media are stored once, then as hardlinks
+            yield lambda file_path, arcname: archive.add(
+                file_path, arcname, recursive=False
+            )
+
+
+def _iter_entries(
+    catalog: PetkitMediaCatalog, media_filter: MediaExportFilter
+) -> Iterator[CatalogEntry]:
+    """Iterate over the catalog entries to export, a batch at a time."""
+    after = None
+    while entries := catalog.export_entries(
+        device_ids=media_filter.device_ids,
+        start_day=media_filter.start_day,
+        end_day=media_filter.end_day,
+        event_types=media_filter.event_types,
+        after=after,
+        limit=MEDIA_EXPORT_BATCH_SIZE,
+    ):
+        yield from entries
+        after = entries[-1].path
+
+
+def _add_file(add: AddToArchive, file_path: Path, arcname: str) -> bool:
+    """Add a file to an archive, return False if it no longer exists."""
+    try:
+        add(file_path, arcname)
+    except FileNotFoundError:
+        LOGGER.debug(f"Media file {arcname} no longer exists, not exported")
+        return False
+    return True
+
+
+def export_media(
+    catalog: PetkitMediaCatalog,
+    media_path: Path,
+    archive_path: Path,
+    archive_format: str,
+    media_filter: MediaExportFilter,
+) -> tuple[int, int]:
+    """Write the media matching a filter into an archive (blocking I/O).
+
+    The archive is written into a temporary file, renamed once complete.
+    Return the number of files and bytes exported.
+    """
+    part_path = archive_path.with_name(f"{archive_path.name}{PART_SUFFIX}")
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    files = size = 0
+    try:
+        with _open_archive(part_path, archive_format) as add:
+            for entry in _iter_entries(catalog, media_filter):
+                if _add_file(add, media_path / entry.path, entry.path):
+                    files += 1
+                    size += entry.size
+        part_path.replace(archive_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    LOGGER.debug(f"Exported {files} media files ({size} bytes) to {archive_path}")
+    return files, size
@@ -0,0 +1,134 @@
+"""MP4 faststart rewrite of the videos for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import shutil
+import struct
+from typing import BinaryIO
+
+FASTSTART_SUFFIX = ".faststart"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Atoms holding the sample tables, down to the chunk offsets
+CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+CHUNK_OFFSET_FORMATS = {b"stco": ">I", b"co64": ">Q"}
+
+type Atom = tuple[bytes, int, int]  # type, offset, size
+
+
+def _parse_header(header: bytes, offset: int, end: int) -> tuple[bytes, int, int]:
+    """Return the type, header size and size of an atom from its header."""
+    if len(header) < 8:
+        raise ValueError(f"Truncated atom header at {offset}")
+    size, atom_type = struct.unpack_from(">I4s", header)
+    header_size = 8
+    if size == 1:
+        if len(header) < 16:
+            raise ValueError(f"Truncated atom header at {offset}")
+        size = struct.unpack_from(">Q", header, 8)[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset
+    if size < header_size or offset + size > end:
+        raise ValueError(f"Invalid size of atom {atom_type!r} at {offset}")
+    return atom_type, header_size, size
+
+
+def _read_atoms(file: BinaryIO, end: int) -> list[Atom]:
+    """Return the top-level atoms of a file."""
+    atoms: list[Atom] = []
+    offset = 0
+    while offset < end:
+        file.seek(offset)
+        atom_type, _, size = _parse_header(file.read(16), offset, end)
+        atoms.append((atom_type, offset, size))
+        offset += size
+    return atoms
+
+
+def _shift_chunk_offsets(
+    moov: bytearray, start: int, end: int, moved: range, shift: int
+) -> None:
+    """Shift the chunk offsets of the sample tables pointing into a moved range."""
+    offset = start
+    while offset < end:
+        atom_type, header_size, size = _parse_header(
+            moov[offset : offset + 16], offset, end
+        )
+        if atom_type in CONTAINER_ATOMS:
+            _shift_chunk_offsets(
+                moov, offset + header_size, offset + size, moved, shift
+            )
+        elif fmt := CHUNK_OFFSET_FORMATS.get(atom_type):
+            # Version and flags, then the number of entries
+            count = struct.unpack_from(">I", moov, offset + header_size + 4)[0]
+            position = offset + header_size + 8
+            item_size = struct.calcsize(fmt)
+            if position + count * item_size > offset + size:
+                raise ValueError(f"Invalid entry count of atom {atom_type!r}")
+            for _ in range(count):
+                value = struct.unpack_from(fmt, moov, position)[0]
+                if value in moved:
+                    value += shift
+                if atom_type == b"stco" and value > 0xFFFFFFFF:
+                    raise ValueError("Chunk offset exceeds 32 bits")
+                struct.pack_into(fmt, moov, position, value)
+                position += item_size
+        offset += size
+
+
+def _copy_range(
+    source: BinaryIO, destination: BinaryIO, offset: int, size: int
+) -> None:
+    """Copy a byte range of a file into another one."""
+    source.seek(offset)
+    while size > 0:
+        chunk = source.read(min(COPY_CHUNK_SIZE, size))
+        if not chunk:
+            raise ValueError("Unexpected end of file")
+        destination.write(chunk)
+        size -= len(chunk)
+
+
+def faststart(file_path: Path) -> bool:
+    """Move the moov atom of an MP4 file before its media data (blocking I/O).
+
+    The atoms are copied as is into a temporary file, only the chunk offsets
+    of the sample tables being shifted, which then replaces the file. Return
+    False if the file is already faststart. Raise ValueError if the file is
+    not a valid MP4 file.
+    """
+    with file_path.open("rb") as source:
+        atoms = _read_atoms(source, os.fstat(source.fileno()).st_size)
+        types = [atom_type for atom_type, _, _ in atoms]
+        if b"moov" not in types or b"mdat" not in types:
+            raise ValueError("Missing moov or mdat atom")
+        _, moov_offset, moov_size = atoms[types.index(b"moov")]
+        _, mdat_offset, _ = atoms[types.index(b"mdat")]
+        if moov_offset < mdat_offset:
+            return False
+
+        source.seek(moov_offset)
+        moov = bytearray(source.read(moov_size))
+        # The atoms from the first mdat up to the moov move after the moov
+        _shift_chunk_offsets(
+            moov, 0, moov_size, range(mdat_offset, moov_offset), moov_size
+        )
+
+        tmp_path = file_path.with_name(f"{file_path.name}{FASTSTART_SUFFIX}")
+        try:
+            with tmp_path.open("wb") as destination:
+                _copy_range(source, destination, 0, mdat_offset)
+                destination.write(moov)
+                _copy_range(source, destination, mdat_offset, moov_offset - mdat_offset)
+                end = moov_offset + moov_size
+                _copy_range(source, destination, end, atoms[-1][1] + atoms[-1][2] - end)
+        except (OSError, ValueError):
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    shutil.copymode(file_path, tmp_path)
+    tmp_path.replace(file_path)
+    return True
@@ -0,0 +1,586 @@
+"""In-memory index of the media files stored on disk for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+import hashlib
+import os
+from pathlib import Path, PurePath
+import re
+import sqlite3
+from typing import TYPE_CHECKING, Any
+
+from pypetkitapi import MediaCloud, MediaFile, MediaType, RecordType
+
+from .const import LOGGER
+from .media_catalog import CatalogEntry, PetkitMediaCatalog
+from .media_faststart import faststart
+from .media_store import PetkitMediaStore
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+# Media are stored as {device_id}/{YYYYMMDD}/{event_type}/{subdir}/{device_id}_{timestamp}.{ext}
+MEDIA_SUBDIRS: dict[MediaType, str] = {
+    MediaType.IMAGE: "snapshot",
+    MediaType.VIDEO: "video",
+}
+MEDIA_FILE_PATTERN = re.compile(
+    rf"^(\d+)_(\d+)\.({MediaType.IMAGE}|{MediaType.VIDEO})$"
+)
+
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+type MediaKey = tuple[RecordType, int, MediaType]
+type LatestKey = tuple[int, str]  # device_id, event_type
+
+
+def parse_media_file(media_path: Path, file_path: Path) -> MediaFile | None:
+    """Build a MediaFile from its path, return None if it is not a Petkit media."""
+    try:
+        device_str, _, event_str, subdir, file_name = file_path.relative_to(
+            media_path
+        ).parts
+    except ValueError:
+        return None
+
+    match = MEDIA_FILE_PATTERN.match(file_name)
+    if not match or match.group(1) != device_str:
+        return None
+
+    try:
+        event_type = RecordType(event_str)
+        media_type = MediaType(match.group(3))
+    except ValueError:
+        return None
+
+    if MEDIA_SUBDIRS[media_type] != subdir:
+        return None
+
+    return MediaFile(
+        event_id=Path(file_name).stem,
+        device_id=int(device_str),
+        timestamp=int(match.group(2)),
+        media_type=media_type,
+        event_type=event_type,
+        full_file_path=file_path,
+    )
+
+
+def get_media_file_path(
+    media_path: Path, media: MediaCloud, media_type: MediaType
+) -> Path:
+    """Return the path where a cloud media is stored once downloaded."""
+    return (
+        media_path
+        / media.filepath
+        / MEDIA_SUBDIRS[media_type]
+        / f"{media.device_id}_{media.timestamp}.{media_type}"
+    )
+
+
+def compute_checksum(file_path: Path) -> str:
+    """Return the SHA-256 checksum of a file (blocking I/O)."""
+    digest = hashlib.sha256()
+    with file_path.open("rb") as file:
+        while chunk := file.read(CHECKSUM_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_media_source(media: MediaCloud, media_type: MediaType) -> str | None:
+    """Return the URL a cloud media is downloaded from."""
+    return media.image if media_type == MediaType.IMAGE else media.video
+
+
+def get_event_pets(device: Any) -> dict[str, str]:
+    """Return the pets recognized by a device in its records, by event id."""
+    records = getattr(device, "device_records", None)
+    if isinstance(records, list):
+        # Litter records
+        items = records
+    else:
+        # Feeder records, grouped by record type
+        items = [
+            item
+            for record_type in RecordType
+            for record in getattr(records, record_type, None) or []
+            for item in getattr(record, "items", None) or []
+        ]
+    return {
+        item.event_id: str(item.pet_id)
+        for item in items
+        if getattr(item, "event_id", None) and getattr(item, "pet_id", None)
+    }
+
+
+def build_catalog_entry(
+    media_path: Path,
+    media_file: MediaFile,
+    with_checksum: bool,
+    source: str | None = None,
+    pet_id: str | None = None,
+) -> CatalogEntry | None:
+    """Build the catalog entry of a media file (blocking I/O)."""
+    file_path = media_file.full_file_path
+    try:
+        stat = file_path.stat()
+        checksum = compute_checksum(file_path) if with_checksum else None
+    except OSError as err:
+        LOGGER.debug(f"Unable to read media file {file_path}: {err}")
+        return None
+
+    rel_path = file_path.relative_to(media_path)
+    return CatalogEntry(
+        path=str(rel_path),
+        device_id=media_file.device_id,
+        event_type=str(media_file.event_type),
+        record_type=MEDIA_SUBDIRS[media_file.media_type],
+        timestamp=media_file.timestamp,
+        day=rel_path.parts[1],
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        checksum=checksum,
+        source=source,
+        pet_id=pet_id,
+    )
+
+
+class PetkitMediaIndex:
+    """Index of the media files on disk, keyed by device, event type and timestamp.
+
+    The index is persisted into the SQLite media catalog and kept up to date
+    incrementally each time a media file is downloaded or deleted. Changes made
+    outside the integration are caught by reconciling the media directories
+    whose modification time changed since the previous reconciliation.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, media_path: Path, catalog_path: Path
+    ) -> None:
+        """Initialize the media index, its catalog being stored at catalog_path."""
+        self.hass = hass
+        self.media_path = media_path
+        self.catalog = PetkitMediaCatalog(catalog_path, media_path)
+        self.store = PetkitMediaStore(media_path)
+        self._files: dict[int, dict[MediaKey, MediaFile]] = {}
+        # Immutable snapshots of the media of each device, shared until it changes
+        self._snapshots: dict[int, tuple[MediaFile, ...]] = {}
+        # Change counters of each device and of the whole index
+        self.version = 0
+        self._versions: dict[int, int] = {}
+        # Most recent snapshot of each device and event type
+        self._latest: dict[LatestKey, CatalogEntry] = {}
+        # Files being hashed and recorded, not indexed yet
+        self._adding: set[Path] = set()
+
+    async def async_load(self) -> None:
+        """Load the index from the media catalog."""
+        entries = await self.hass.async_add_executor_job(self._load)
+        self._files = {}
+        self._snapshots = {}
+        self._latest = {}
+        self.version += 1
+        for entry in entries:
+            self._add_to_memory(self._to_media_file(entry))
+        self._update_latest(entries)
+        LOGGER.debug(f"Media index loaded with {len(entries)} files")
+
+    def _load(self) -> list[CatalogEntry]:
+        """Open and reconcile the catalog, then read it (blocking I/O)."""
+        try:
+            self.catalog.open()
+        except (OSError, sqlite3.Error) as err:
+            LOGGER.error(f"Unable to open the media catalog: {err}")
+            added, _ = self._reconcile()
+            return added
+
+        self._reconcile()
+        return self.catalog.all_entries()
+
+    async def async_reconcile(self) -> set[int]:
+        """Reconcile the index with the media directories, return the changed devices."""
+        added, removed = await self.hass.async_add_executor_job(self._reconcile)
+        for entry in added:
+            self._add_to_memory(self._to_media_file(entry))
+        self._update_latest(added)
+        for path in removed:
+            self._remove_from_memory(self.media_path / path)
+        await self._async_refresh_latest(removed)
+
+        if added or removed:
+            LOGGER.debug(
+                f"Media index reconciled: {len(added)} files added, {len(removed)} removed"
+            )
+        return {entry.device_id for entry in added} | {
+            int(PurePath(path).parts[0]) for path in removed
+        }
+
+    def _reconcile(self) -> tuple[list[CatalogEntry], list[str]]:
+        """Apply the changes of the media directories to the catalog (blocking I/O).
+
+        Only the modification time of the media directories is checked, their
+        files are listed only when it changed since the previous reconciliation.
+        """
+        known_dirs = self.catalog.directory_mtimes()
+        added: list[CatalogEntry] = []
+        removed: list[str] = []
+
+        for media_dir in self._iter_media_dirs():
+            rel_dir = str(media_dir.relative_to(self.media_path))
+            try:
+                mtime = media_dir.stat().st_mtime
+            except OSError:
+                continue
+            if known_dirs.pop(rel_dir, None) == mtime:
+                continue
+
+            dir_added, dir_removed = self._reconcile_dir(media_dir)
+            added.extend(dir_added)
+            removed.extend(dir_removed)
+            self.catalog.set_directory_mtime(rel_dir, mtime)
+
+        # Directories which no longer exist on disk
+        for rel_dir in known_dirs:
+            device_str, *parts = PurePath(rel_dir).parts
+            removed.extend(
+                entry.path for entry in self.catalog.list_files(int(device_str), *parts)
+            )
+            self.catalog.delete_directory(rel_dir)
+
+        self.catalog.upsert(added)
+        self.catalog.delete(removed)
+        return added, removed
+
+    def _reconcile_dir(self, media_dir: Path) -> tuple[list[CatalogEntry], list[str]]:
+        """Compare the files of a media directory with the catalog (blocking I/O)."""
+        device_str, *parts = media_dir.relative_to(self.media_path).parts
+        in_catalog = {
+            entry.path for entry in self.catalog.list_files(int(device_str), *parts)
+        }
+
+        on_disk: dict[str, MediaFile] = {}
+        try:
+            with os.scandir(media_dir) as dir_entries:
+                for dir_entry in dir_entries:
+                    media_file = parse_media_file(self.media_path, Path(dir_entry.path))
+                    if media_file and dir_entry.is_file():
+                        on_disk[
+                            str(Path(dir_entry.path).relative_to(self.media_path))
+                        ] = media_file
+        except OSError as err:
+            LOGGER.debug(f"Unable to list media directory {media_dir}: {err}")
+            return [], []
+
+        added = [
+            entry
+            for path, media_file in on_disk.items()
+            if path not in in_catalog
+            and (
+                entry := build_catalog_entry(
+                    self.media_path, media_file, with_checksum=False
+                )
+            )
+        ]
+        return added, [path for path in in_catalog if path not in on_disk]
+
+    def _iter_media_dirs(self) -> Iterator[Path]:
+        """Iterate over the {device_id}/{YYYYMMDD}/{event_type}/{subdir} directories."""
+
+        def subdirs(path: Path) -> list[Path]:
+            try:
+                with os.scandir(path) as dir_entries:
+                    return [Path(entry.path) for entry in dir_entries if entry.is_dir()]
+            except OSError:
+                return []
+
+        for device_dir in subdirs(self.media_path):
+            if not device_dir.name.isdigit():
+                continue
+            for day_dir in subdirs(device_dir):
+                for event_dir in subdirs(day_dir):
+                    for media_dir in subdirs(event_dir):
+                        if media_dir.name in MEDIA_SUBDIRS.values():
+                            yield media_dir
+
+    def _to_media_file(self, entry: CatalogEntry) -> MediaFile:
+        """Convert a catalog entry to a media file."""
+        media_type = next(
+            media_type
+            for media_type, subdir in MEDIA_SUBDIRS.items()
+            if subdir == entry.record_type
+        )
+        return MediaFile(
+            event_id=f"{entry.device_id}_{entry.timestamp}",
+            device_id=entry.device_id,
+            timestamp=entry.timestamp,
+            media_type=media_type,
+            event_type=RecordType(entry.event_type),
+            full_file_path=self.media_path / entry.path,
+        )
+
+    async def async_close(self) -> None:
+        """Close the media catalog."""
+        await self.hass.async_add_executor_job(self.catalog.close)
+
+    @staticmethod
+    def _key(media_file: MediaFile) -> MediaKey:
+        """Return the index key of a media file."""
+        return media_file.event_type, media_file.timestamp, media_file.media_type
+
+    def _add_to_memory(self, media_file: MediaFile) -> None:
+        """Add a media file to the in-memory index."""
+        self._changed(media_file.device_id)
+        self._files.setdefault(media_file.device_id, {})[
+            self._key(media_file)
+        ] = media_file
+
+    def _remove_from_memory(self, file_path: Path) -> MediaFile | None:
+        """Remove a media file from the in-memory index."""
+        media_file = parse_media_file(self.media_path, file_path)
+        if media_file is None:
+            return None
+        removed = self._files.get(media_file.device_id, {}).pop(
+            self._key(media_file), None
+        )
+        if removed is not None:
+            self._changed(media_file.device_id)
+        return removed
+
+    def _update_latest(self, entries: Iterable[CatalogEntry]) -> None:
+        """Record the snapshots more recent than the latest ones."""
+        for entry in entries:
+            if entry.record_type != MEDIA_SUBDIRS[MediaType.IMAGE]:
+                continue
+            key = (entry.device_id, entry.event_type)
+            latest = self._latest.get(key)
+            if latest is None or entry.timestamp >= latest.timestamp:
+                self._latest[key] = entry
+
+    async def _async_refresh_latest(self, removed_paths: Iterable[str]) -> None:
+        """Look up the latest snapshots replacing the removed ones in the catalog."""
+        removed_paths = set(removed_paths)
+        keys = [
+            key for key, entry in self._latest.items() if entry.path in removed_paths
+        ]
+        if not keys:
+            return
+        latest = await self.hass.async_add_executor_job(
+            lambda: {
+                key: self.catalog.latest(*key, MEDIA_SUBDIRS[MediaType.IMAGE])
+                for key in keys
+            }
+        )
+        for key, entry in latest.items():
+            if entry is None:
+                self._latest.pop(key, None)
+            else:
+                self._latest[key] = entry
+
+    def get_latest_snapshot(
+        self, device_id: int, event_type: str
+    ) -> CatalogEntry | None:
+        """Return the most recent snapshot of a device for an event type."""
+        return self._latest.get((device_id, event_type))
+
+    def _changed(self, device_id: int) -> None:
+        """Invalidate the snapshot and bump the version of a device."""
+        self._snapshots.pop(device_id, None)
+        self._versions[device_id] = self._versions.get(device_id, 0) + 1
+        self.version += 1
+
+    def notify_changed(self, device_ids: Iterable[int]) -> None:
+        """Flag devices whose catalog entries were updated outside of the index."""
+        for device_id in device_ids:
+            self._changed(device_id)
+
+    def get_version(self, device_id: int) -> int:
+        """Return the change counter of a device."""
+        return self._versions.get(device_id, 0)
+
+    def contains_file(self, file_path: Path) -> bool:
+        """Check if a file is already indexed."""
+        media_file = parse_media_file(self.media_path, file_path)
+        return media_file is not None and self._key(media_file) in self._files.get(
+            media_file.device_id, {}
+        )
+
+    async def async_add_files(
+        self,
+        file_paths: list[Path],
+        sources: dict[Path, str] | None = None,
+        pets: dict[Path, str] | None = None,
+    ) -> list[MediaFile]:
+        """Add the media files existing on disk to the index and to the catalog.
+
+        Files are deduplicated through the media store, sources are the URLs
+        files were downloaded from and pets the pets recognized in them. Files
+        already being added, e.g. a download also seen by the watcher, are
+        skipped.
+        """
+        media_files = [
+            media_file
+            for file_path in file_paths
+            if file_path not in self._adding
+            and not self.contains_file(file_path)
+            and (media_file := parse_media_file(self.media_path, file_path))
+        ]
+        if not media_files:
+            return []
+
+        adding = {media_file.full_file_path for media_file in media_files}
+        self._adding |= adding
+        try:
+            recorded = await self.hass.async_add_executor_job(
+                self._catalog_add, media_files, sources or {}, pets or {}
+            )
+        finally:
+            self._adding -= adding
+        for media_file, _ in recorded:
+            self._add_to_memory(media_file)
+        self._update_latest(entry for _, entry in recorded)
+        return [media_file for media_file, _ in recorded]
+
+    def _catalog_add(
+        self,
+        media_files: list[MediaFile],
+        sources: dict[Path, str],
+        pets: dict[Path, str],
+    ) -> list[tuple[MediaFile, CatalogEntry]]:
+        """Record the media files existing on disk into the catalog (blocking I/O)."""
+        recorded = [
+            (media_file, entry)
+            for media_file in media_files
+            if (
+                entry := build_catalog_entry(
+                    self.media_path,
+                    media_file,
+                    with_checksum=True,
+                    source=sources.get(media_file.full_file_path),
+                    pet_id=pets.get(media_file.full_file_path),
+                )
+            )
+        ]
+        for media_file, entry in recorded:
+            self.store.deduplicate(media_file.full_file_path, str(entry.checksum))
+        self.catalog.upsert(entry for _, entry in recorded)
+        return recorded
+
+    async def async_remove_files(self, file_paths: list[Path]) -> list[MediaFile]:
+        """Remove media files from the index and from the catalog."""
+        removed = [
+            media_file
+            for file_path in file_paths
+            if (media_file := self._remove_from_memory(file_path))
+        ]
+        removed_paths = [
+            str(media_file.full_file_path.relative_to(self.media_path))
+            for media_file in removed
+        ]
+        await self.hass.async_add_executor_job(self.catalog.delete, removed_paths)
+        await self._async_refresh_latest(removed_paths)
+        return removed
+
+    async def async_remove_tree(self, path: Path) -> list[MediaFile]:
+        """Remove all the media files located under a directory from the index."""
+        try:
+            device_id = int(path.relative_to(self.media_path).parts[0])
+        except (ValueError, IndexError):
+            return []
+
+        return await self.async_remove_files(
+            [
+                media_file.full_file_path
+                for media_file in self._files.get(device_id, {}).values()
+                if media_file.full_file_path.is_relative_to(path)
+            ]
+        )
+
+    async def async_backfill_checksums(self, limit: int) -> None:
+        """Compute the checksums missing from the catalog, a few files at a time."""
+        await self.hass.async_add_executor_job(self._backfill_checksums, limit)
+
+    def _backfill_checksums(self, limit: int) -> None:
+        """Compute the checksums missing from the catalog (blocking I/O)."""
+        for entry in self.catalog.entries_without_checksum(limit):
+            try:
+                checksum = compute_checksum(self.media_path / entry.path)
+            except OSError as err:
+                LOGGER.debug(f"Unable to compute checksum of {entry.path}: {err}")
+                self.catalog.delete([entry.path])
+                continue
+            self.catalog.set_checksum(entry.path, checksum)
+            self.store.deduplicate(self.media_path / entry.path, checksum)
+
+    async def async_faststart_videos(self, limit: int) -> None:
+        """Rewrite the downloaded videos so that they start playing sooner, a few at a time."""
+        await self.hass.async_add_executor_job(self._faststart_videos, limit)
+
+    def _faststart_videos(self, limit: int) -> None:
+        """Move the moov atom of the videos before their media data (blocking I/O).
+
+        Rewritten videos are no longer linked to the media store, their new
+        checksum being backfilled and deduplicated later on.
+        """
+        for entry in self.catalog.entries_without_faststart(limit):
+            file_path = self.media_path / entry.path
+            try:
+                rewritten = faststart(file_path)
+                stat = file_path.stat()
+            except (OSError, ValueError) as err:
+                LOGGER.debug(f"Unable to rewrite video {entry.path}: {err}")
+                self.catalog.set_faststart(entry.path, False)
+                continue
+            if rewritten:
+                LOGGER.debug(f"Moved the moov atom of {entry.path} first")
+                self.catalog.set_faststart(
+                    entry.path, True, stat.st_size, stat.st_mtime
+                )
+            else:
+                self.catalog.set_faststart(entry.path, True)
+
+    async def async_link_from_source(self, file_path: Path, source: str) -> bool:
+        """Create a media file from an identical one downloaded from the same source."""
+        return await self.hass.async_add_executor_job(
+            self._link_from_source, file_path, source
+        )
+
+    def _link_from_source(self, file_path: Path, source: str) -> bool:
+        """Link a media file to the stored content of its source (blocking I/O)."""
+        entry = self.catalog.find_by_source(source)
+        if entry is None or entry.checksum is None:
+            return False
+        return self.store.link(entry.checksum, file_path.suffix, file_path)
+
+    def contains(self, media: MediaCloud, media_type: MediaType) -> bool:
+        """Check if a cloud media is already stored on disk."""
+        return (media.event_type, media.timestamp, media_type) in self._files.get(
+            media.device_id, {}
+        )
+
+    def get_device_media(self, device_id: int) -> tuple[MediaFile, ...]:
+        """Return all the media files of a device.
+
+        The same tuple is returned as long as the media of the device are unchanged.
+        """
+        if (snapshot := self._snapshots.get(device_id)) is None:
+            snapshot = tuple(self._files.get(device_id, {}).values())
+            self._snapshots[device_id] = snapshot
+        return snapshot
+
+    def list_missing_media_types(
+        self,
+        media: MediaCloud,
+        media_types: list[MediaType],
+        event_types: list[RecordType],
+    ) -> list[MediaType]:
+        """Return the media types of a cloud media which are not stored on disk."""
+        if media.event_type not in event_types:
+            return []
+
+        available = {MediaType.IMAGE: media.image, MediaType.VIDEO: media.video}
+        return [
+            media_type
+            for media_type in media_types
+            if available[media_type] and not self.contains(media, media_type)
+        ]
@@ -0,0 +1,243 @@
+"""Retention of the media files for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+import re
+import shutil
+from typing import TYPE_CHECKING
+
+from pypetkitapi import MediaType
+
+from homeassistant.core import HomeAssistant
+
+from .const import LOGGER, MEDIA_EVICTION_BATCH_DELAY, MEDIA_EVICTION_BATCH_SIZE
+from .media_index import MEDIA_SUBDIRS
+from .media_thumbnail import THUMBNAIL_DIRNAME, get_thumbnail_path
+
+if TYPE_CHECKING:
+    from .media_catalog import CatalogEntry
+    from .media_index import PetkitMediaIndex
+
+MEGABYTE = 1024 * 1024
+DAY_DIR_PATTERN = re.compile(r"\d{8}")
+
+
+def _is_expired_day(name: str, retention_day: str) -> bool:
+    """Return True if a directory name is a YYYYMMDD day before the retention day."""
+    if not DAY_DIR_PATTERN.fullmatch(name):
+        return False
+    try:
+        datetime.strptime(name, "%Y%m%d")
+    except ValueError:
+        return False
+    return name < retention_day
+
+
+@dataclass(frozen=True, kw_only=True)
+class MediaRetentionPolicy:
+    """Retention policy of the media files, quotas are in bytes (0 = unlimited)."""
+
+    delete_after: int = 0  # days
+    snapshot_quota: int = 0
+    video_quota: int = 0
+    device_snapshot_quota: int = 0
+    device_video_quota: int = 0
+    least_accessed: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if at least one limit is set."""
+        return bool(
+            self.delete_after
+            or self.snapshot_quota
+            or self.video_quota
+            or self.device_snapshot_quota
+            or self.device_video_quota
+        )
+
+
+class PetkitMediaRetention:
+    """Evict the media files exceeding the retention policy.
+
+    Files to evict are selected from the media catalog, then deleted in small
+    batches spread over time, the media index being updated after each batch.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        media_index: PetkitMediaIndex,
+        policy: MediaRetentionPolicy,
+    ) -> None:
+        """Initialize the media retention."""
+        self.hass = hass
+        self.media_index = media_index
+        self.media_path = media_index.media_path
+        self.policy = policy
+
+    async def async_enforce(self, device_ids: Iterable[int]) -> set[int]:
+        """Evict the media files exceeding the policy, return the changed devices.
+
+        Expired day directories are only looked for in the folders of devices.
+        """
+        if not self.policy.enabled:
+            LOGGER.debug("Media deletion is disabled by configuration")
+            return set()
+
+        retention_day = self._get_retention_day()
+        evictions = await self.hass.async_add_executor_job(
+            self._select_evictions, retention_day
+        )
+        if evictions:
+            LOGGER.debug(f"Evicting {len(evictions)} media files")
+
+        changed: set[int] = set()
+        for start in range(0, len(evictions), MEDIA_EVICTION_BATCH_SIZE):
+            if start:
+                await asyncio.sleep(MEDIA_EVICTION_BATCH_DELAY)
+            file_paths = [
+                self.media_path / entry.path
+                for entry in evictions[start : start + MEDIA_EVICTION_BATCH_SIZE]
+            ]
+            await self.hass.async_add_executor_job(self._delete_files, file_paths)
+            removed = await self.media_index.async_remove_files(file_paths)
+            changed |= {media_file.device_id for media_file in removed}
+
+        expired_dirs = False
+        if retention_day:
+            expired_dirs = await self.hass.async_add_executor_job(
+                self._remove_expired_dirs, retention_day, list(device_ids)
+            )
+        if evictions or expired_dirs:
+            await self.hass.async_add_executor_job(self.media_index.store.prune)
+        return changed
+
+    def _get_retention_day(self) -> str | None:
+        """Return the first day kept by the age rule, None if disabled."""
+        if not self.policy.delete_after:
+            return None
+        return (datetime.now() - timedelta(days=self.policy.delete_after)).strftime(
+            "%Y%m%d"
+        )
+
+    def _select_evictions(self, retention_day: str | None) -> list[CatalogEntry]:
+        """Select the entries to evict from the catalog (blocking I/O).
+
+        Disk usage is summed by the catalog, only the entries exceeding a quota
+        are read.
+        """
+        catalog = self.media_index.catalog
+        evicted: dict[str, CatalogEntry] = {}
+
+        if retention_day:
+            evicted.update(
+                (entry.path, entry) for entry in catalog.entries_before(retention_day)
+            )
+
+        for media_type, quota, device_quota in (
+            (
+                MediaType.IMAGE,
+                self.policy.snapshot_quota,
+                self.policy.device_snapshot_quota,
+            ),
+            (MediaType.VIDEO, self.policy.video_quota, self.policy.device_video_quota),
+        ):
+            if not quota and not device_quota:
+                continue
+            record_type = MEDIA_SUBDIRS[media_type]
+            # Entries evicted by the age rule no longer count
+            usage = catalog.usage(record_type, retention_day)
+
+            if device_quota:
+                for device_id, total in usage.items():
+                    if total <= device_quota:
+                        continue
+                    for entry in catalog.eviction_candidates(
+                        record_type,
+                        self.policy.least_accessed,
+                        device_id=device_id,
+                        since_day=retention_day,
+                        batch_size=MEDIA_EVICTION_BATCH_SIZE,
+                    ):
+                        evicted[entry.path] = entry
+                        usage[device_id] -= entry.size
+                        if usage[device_id] <= device_quota:
+                            break
+
+            total = sum(usage.values())
+            if quota and total > quota:
+                for entry in catalog.eviction_candidates(
+                    record_type,
+                    self.policy.least_accessed,
+                    since_day=retention_day,
+                    batch_size=MEDIA_EVICTION_BATCH_SIZE,
+                ):
+                    if entry.path in evicted:
+                        continue
+                    evicted[entry.path] = entry
+                    total -= entry.size
+                    if total <= quota:
+                        break
+
+        return list(evicted.values())
+
+    def _delete_files(self, file_paths: list[Path]) -> None:
+        """Delete files and the directories left empty (blocking I/O)."""
+        for file_path in file_paths:
+            try:
+                file_path.unlink(missing_ok=True)
+            except OSError as err:
+                LOGGER.warning(f"Unable to delete media file {file_path}: {err}")
+                continue
+            self._remove_empty_dirs(file_path)
+            if file_path.suffix == f".{MediaType.IMAGE}":
+                thumbnail_path = self.media_path / get_thumbnail_path(
+                    str(file_path.relative_to(self.media_path))
+                )
+                thumbnail_path.unlink(missing_ok=True)
+
+    def _remove_expired_dirs(self, retention_day: str, device_ids: list[int]) -> bool:
+        """Remove the day directories of devices expired by the age rule (blocking I/O).
+
+        Their media were evicted, this removes what is left in them: partial
+        downloads, video segments, temporary files and thumbnails. Return True
+        if any directory was removed.
+        """
+        removed = False
+        device_dirs = [
+            root / str(device_id)
+            for root in (self.media_path, self.media_path / THUMBNAIL_DIRNAME)
+            for device_id in device_ids
+        ]
+        for device_dir in device_dirs:
+            try:
+                day_dirs = [path for path in device_dir.iterdir() if path.is_dir()]
+            except FileNotFoundError:
+                continue
+            except OSError as err:
+                LOGGER.warning(f"Unable to list {device_dir}: {err}")
+                continue
+            for day_dir in day_dirs:
+                if not _is_expired_day(day_dir.name, retention_day):
+                    continue
+                LOGGER.debug(f"Deleting expired media directory {day_dir}")
+                try:
+                    shutil.rmtree(day_dir)
+                except OSError as err:
+                    LOGGER.warning(f"Unable to delete {day_dir}: {err}")
+                    continue
+                removed = True
+        return removed
+
+    @staticmethod
+    def _remove_empty_dirs(file_path: Path) -> None:
+        """Remove the {YYYYMMDD}/{event_type}/{subdir} directories of a file once empty."""
+        with suppress(OSError):
+            for directory in list(file_path.parents)[:3]:
+                directory.rmdir()
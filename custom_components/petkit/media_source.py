@@ -2,19 +2,25 @@
 
 from __future__ import annotations
 
-import asyncio
+from collections import OrderedDict
 from datetime import datetime
 import logging
-from pathlib import Path
+from pathlib import Path, PurePath
 import re
+import time
+from typing import TYPE_CHECKING
 
 from custom_components.petkit.const import (
-    CONF_MEDIA_PATH,
-    COORDINATOR,
-    DEFAULT_MEDIA_PATH,
+    COORDINATOR_MEDIA,
     DOMAIN,
-    MEDIA_SECTION,
+    MEDIA_BROWSER_CACHE_SIZE,
+    MEDIA_BROWSER_CACHE_TTL,
+    MEDIA_BROWSER_PAGE_SIZE,
 )
+from custom_components.petkit.media_catalog import CatalogEntry
+from custom_components.petkit.media_index import PetkitMediaIndex
+from custom_components.petkit.media_thumbnail import get_thumbnail_path
+from custom_components.petkit.media_view import get_media_url
 from homeassistant.components.media_player import (
     MediaClass,
     MediaType,
@@ -25,14 +31,34 @@ from homeassistant.components.media_source import (
     MediaSource,
     MediaSourceItem,
     PlayMedia,
+    Unresolvable,
 )
 from homeassistant.core import HomeAssistant
 
+if TYPE_CHECKING:
+    from custom_components.petkit.coordinator import PetkitMediaUpdateCoordinator
+
 _LOGGER = logging.getLogger(__name__)
 
 EXT_MP4 = ".mp4"
 EXT_JPG = ".jpg"
 
+# Separates the path of a browsed node from the cursor of its page
+PAGE_SEPARATOR = "@"
+# Separates the timestamp and the path of an event cursor
+EVENT_CURSOR_SEPARATOR = ":"
+
+# Virtual folders listing the events of all devices, next to the devices
+VIRTUAL_RECENT = "recent"
+VIRTUAL_PETS = "pets"
+VIRTUAL_EVENTS = "events"
+VIRTUAL_FOLDERS = {
+    VIRTUAL_RECENT: "Last 24h",
+    VIRTUAL_PETS: "By pet",
+    VIRTUAL_EVENTS: "By event type",
+}
+RECENT_PERIOD = 24 * 3600  # seconds
+
 
 async def async_get_media_source(hass: HomeAssistant) -> PetkitMediaSource:
     """Set up Petkit media source."""
@@ -46,48 +72,78 @@ class PetkitMediaSource(MediaSource):
         """Initialize PetkitMediaSource."""
         super().__init__(DOMAIN)
         self.hass = hass
-        self.coordinator = self.get_coordinator()
-        self.media_path = Path(
-            self.coordinator.config_entry.options.get(MEDIA_SECTION, {}).get(
-                CONF_MEDIA_PATH, DEFAULT_MEDIA_PATH
-            )
-        )
+        # Children of the browsed nodes, with the media index version they match
+        self._cache: OrderedDict[
+            str, tuple[tuple[PetkitMediaIndex, int], float, list[BrowseMediaSource]]
+        ] = OrderedDict()
 
-    def get_coordinator(self):
-        """Retrieve the integration's coordinator."""
-        if DOMAIN in self.hass.data and COORDINATOR in self.hass.data[DOMAIN]:
-            return self.hass.data[DOMAIN][COORDINATOR]
-        _LOGGER.error("Petkit coordinator not found in hass.data.")
+    @property
+    def coordinator(self) -> PetkitMediaUpdateCoordinator | None:
+        """Retrieve the integration's media coordinator."""
+        if DOMAIN in self.hass.data and COORDINATOR_MEDIA in self.hass.data[DOMAIN]:
+            return self.hass.data[DOMAIN][COORDINATOR_MEDIA]
+        _LOGGER.error("Petkit media coordinator not found in hass.data.")
         return None
 
+    @property
+    def media_index(self) -> PetkitMediaIndex:
+        """Retrieve the media index of the integration."""
+        if self.coordinator is None:
+            raise Unresolvable("Petkit integration is not loaded")
+        return self.coordinator.media_index
+
     async def async_resolve_media(self, item: MediaSourceItem) -> PlayMedia:
         """Resolve media to a URL/path."""
-        file_path = self.media_path / Path(item.identifier)
-        if not file_path.exists():
-            raise ValueError(f"File not found: {file_path}")
+        entry = await self.hass.async_add_executor_job(
+            self.media_index.catalog.get, item.identifier
+        )
+        if entry is None:
+            raise ValueError(f"File not found: {item.identifier}")
+        await self.hass.async_add_executor_job(
+            self.media_index.catalog.set_last_access, entry.path, time.time()
+        )
 
         url = async_process_play_media_url(
             self.hass,
-            f"/media/local/{file_path.relative_to(self.media_path)}",
+            get_media_url(entry.path),
             allow_relative_url=True,
             for_supervisor_network=True,
         )
-        mime_type = self.get_mime_type(file_path.suffix)
+        mime_type = self.get_mime_type(Path(entry.path).suffix)
         return PlayMedia(url, mime_type)
 
     async def async_browse_media(self, item: MediaSourceItem) -> BrowseMediaSource:
         """Browse the media source."""
-        identifier = item.identifier or str(self.media_path)
-        current_path = self.media_path / Path(identifier)
+        identifier = item.identifier or ""
+        path, _, cursor = identifier.partition(PAGE_SEPARATOR)
+        parts = PurePath(path).parts
 
-        if not current_path.exists() or not current_path.is_dir():
-            raise ValueError(f"Invalid path: {current_path}")
+        if len(parts) > 4:
+            raise ValueError(f"Invalid path: {identifier}")
 
-        children = await asyncio.to_thread(self._get_children_from_path, current_path)
+        media_index = self.media_index
+        version = (
+            media_index,
+            (
+                media_index.get_version(int(parts[0]))
+                if parts and parts[0].isdigit()
+                else media_index.version
+            ),
+        )
+
+        # The last 24h change with time, not only with the media index
+        cacheable = parts[:1] != (VIRTUAL_RECENT,)
+        children = self._get_cached_children(identifier, version) if cacheable else None
+        if children is None:
+            children = await self.hass.async_add_executor_job(
+                self._get_children_from_catalog, parts, cursor or None
+            )
+            if cacheable:
+                self._cache_children(identifier, version, children)
 
         return BrowseMediaSource(
             domain=DOMAIN,
-            identifier=str(current_path),
+            identifier=identifier,
             title=DOMAIN.capitalize(),
             media_class=MediaClass.DIRECTORY,
             media_content_type=MediaType.PLAYLIST,
@@ -96,52 +152,245 @@ class PetkitMediaSource(MediaSource):
             children=children,
         )
 
-    def _get_children_from_path(self, path: Path):
-        """Get children from a path."""
-        children = []
-        for child in sorted(path.iterdir()):
-            if child.is_dir():
-                title = self.get_device_name_from_data(
-                    self.convert_date(child.name)
-                ).capitalize()
-
-                if title.lower() == "snapshot":
-                    media_class = MediaClass.IMAGE
-                elif title.lower() == "video":
-                    media_class = MediaClass.VIDEO
-                else:
-                    media_class = MediaClass.DIRECTORY
-
-                children.append(
-                    BrowseMediaSource(
-                        domain=DOMAIN,
-                        identifier=str(child.relative_to(self.media_path)),
-                        title=title,
-                        media_class=media_class,
-                        media_content_type=MediaType.VIDEO,
-                        can_expand=True,
-                        can_play=False,
+    def _get_cached_children(
+        self, identifier: str, version: tuple[PetkitMediaIndex, int]
+    ) -> list[BrowseMediaSource] | None:
+        """Return the cached children of a node, if still valid."""
+        if (cached := self._cache.get(identifier)) is None:
+            return None
+        cached_version, expires_at, children = cached
+        if cached_version != version or expires_at < time.monotonic():
+            del self._cache[identifier]
+            return None
+        self._cache.move_to_end(identifier)
+        return children
+
+    def _cache_children(
+        self,
+        identifier: str,
+        version: tuple[PetkitMediaIndex, int],
+        children: list[BrowseMediaSource],
+    ) -> None:
+        """Cache the children of a node, evicting the least recently browsed."""
+        self._cache[identifier] = (
+            version,
+            time.monotonic() + MEDIA_BROWSER_CACHE_TTL,
+            children,
+        )
+        self._cache.move_to_end(identifier)
+        while len(self._cache) > MEDIA_BROWSER_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _get_children_from_catalog(
+        self, parts: tuple[str, ...], cursor: str | None
+    ) -> list[BrowseMediaSource]:
+        """Get the children of a device/day/event_type/record_type path (blocking I/O).
+
+        Days and files are paginated, most recent first: a page ends with a
+        "more" node whose cursor is the last day or timestamp of the page.
+        """
+        catalog = self.media_index.catalog
+        more_cursor = None
+
+        if parts and parts[0] in VIRTUAL_FOLDERS:
+            return self._get_virtual_children(parts, cursor)
+
+        try:
+            if not parts:
+                names = [str(device_id) for device_id in catalog.list_devices()]
+            elif len(parts) == 1:
+                names = catalog.list_days(
+                    int(parts[0]), cursor, MEDIA_BROWSER_PAGE_SIZE + 1
+                )
+                if len(names) > MEDIA_BROWSER_PAGE_SIZE:
+                    names = names[:MEDIA_BROWSER_PAGE_SIZE]
+                    more_cursor = names[-1]
+            elif len(parts) == 2:
+                names = catalog.list_event_types(int(parts[0]), parts[1])
+            elif len(parts) == 3:
+                names = catalog.list_record_types(int(parts[0]), parts[1], parts[2])
+            else:
+                entries = catalog.list_files(
+                    int(parts[0]),
+                    *parts[1:],
+                    before=int(cursor) if cursor else None,
+                    limit=MEDIA_BROWSER_PAGE_SIZE + 1,
+                )
+                children = [
+                    self._build_file_media_item(entry)
+                    for entry in entries[:MEDIA_BROWSER_PAGE_SIZE]
+                ]
+                if len(entries) > MEDIA_BROWSER_PAGE_SIZE:
+                    children.append(
+                        self._build_more_item(
+                            parts, str(entries[MEDIA_BROWSER_PAGE_SIZE - 1].timestamp)
+                        )
                     )
+                return children
+        except ValueError as err:
+            raise ValueError(f"Invalid path: {PurePath(*parts)}") from err
+
+        children = []
+        for name in names:
+            if parts:
+                title = self.convert_date(name).capitalize()
+            else:
+                title = self.get_device_name_from_data(name).capitalize()
+
+            if title.lower() == "snapshot":
+                media_class = MediaClass.IMAGE
+            elif title.lower() == "video":
+                media_class = MediaClass.VIDEO
+            else:
+                media_class = MediaClass.DIRECTORY
+
+            children.append(
+                BrowseMediaSource(
+                    domain=DOMAIN,
+                    identifier=str(PurePath(*parts, name)),
+                    title=title,
+                    media_class=media_class,
+                    media_content_type=MediaType.VIDEO,
+                    can_expand=True,
+                    can_play=False,
                 )
-            elif child.is_file():
-                children.append(self._build_file_media_item(child))
+            )
+        if more_cursor is not None:
+            children.append(self._build_more_item(parts, more_cursor))
+        if not parts:
+            children[:0] = [
+                self._build_folder_item((folder,), title)
+                for folder, title in VIRTUAL_FOLDERS.items()
+            ]
         return children
 
-    def _build_file_media_item(self, child: Path) -> BrowseMediaSource:
-        """Build a file media item."""
-        thumbnail_url = async_process_play_media_url(
-            self.hass,
-            f"/media/local/{str(child.parent.relative_to(self.media_path)).replace('video', 'snapshot')}/{child.name.replace('.mp4', '.jpg')}",
-            allow_relative_url=True,
-            for_supervisor_network=True,
+    def _get_virtual_children(
+        self, parts: tuple[str, ...], cursor: str | None
+    ) -> list[BrowseMediaSource]:
+        """Get the children of a virtual folder (blocking I/O).
+
+        Events are searched across all devices with a single indexed query,
+        paginated like the files of a device.
+        """
+        catalog = self.media_index.catalog
+        folder, *criterion = parts
+
+        if len(parts) == 1 and folder == VIRTUAL_PETS:
+            return [
+                self._build_folder_item(
+                    (folder, pet_id), self.get_device_name_from_data(pet_id)
+                )
+                for pet_id in catalog.list_pets()
+            ]
+        if len(parts) == 1 and folder == VIRTUAL_EVENTS:
+            return [
+                self._build_folder_item((folder, event_type), event_type.capitalize())
+                for event_type in catalog.list_all_event_types()
+            ]
+
+        if len(parts) == 1 and folder == VIRTUAL_RECENT:
+            search = {"since": int(time.time()) - RECENT_PERIOD}
+        elif len(parts) == 2 and folder == VIRTUAL_PETS:
+            search = {"pet_id": criterion[0]}
+        elif len(parts) == 2 and folder == VIRTUAL_EVENTS:
+            search = {"event_type": criterion[0]}
+        else:
+            raise ValueError(f"Invalid path: {PurePath(*parts)}")
+
+        try:
+            entries = catalog.search(
+                **search,
+                before=self._parse_event_cursor(cursor) if cursor else None,
+                limit=MEDIA_BROWSER_PAGE_SIZE + 1,
+            )
+        except ValueError as err:
+            raise ValueError(f"Invalid path: {PurePath(*parts)}") from err
+
+        children = [
+            self._build_file_media_item(entry, self._get_event_title(entry))
+            for entry in entries[:MEDIA_BROWSER_PAGE_SIZE]
+        ]
+        if len(entries) > MEDIA_BROWSER_PAGE_SIZE:
+            last = entries[MEDIA_BROWSER_PAGE_SIZE - 1]
+            children.append(
+                self._build_more_item(
+                    parts, f"{last.timestamp}{EVENT_CURSOR_SEPARATOR}{last.path}"
+                )
+            )
+        return children
+
+    @staticmethod
+    def _parse_event_cursor(cursor: str) -> tuple[int, str]:
+        """Return the timestamp and path of an event cursor."""
+        timestamp, _, path = cursor.partition(EVENT_CURSOR_SEPARATOR)
+        if not path:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return int(timestamp), path
+
+    def _get_event_title(self, entry: CatalogEntry) -> str:
+        """Return the title of an event listed across devices."""
+        return (
+            f"{entry.event_type.capitalize()} - "
+            f"{self.get_device_name_from_data(str(entry.device_id))} - "
+            f"{datetime.fromtimestamp(entry.timestamp).strftime('%d/%m/%Y %H:%M:%S')}"
         )
-        media_class = self.get_media_class(child.suffix)
-        media_type = self.get_media_type(child.suffix)
 
+    @staticmethod
+    def _build_folder_item(parts: tuple[str, ...], title: str) -> BrowseMediaSource:
+        """Build the node of a virtual folder."""
         return BrowseMediaSource(
             domain=DOMAIN,
-            identifier=str(child.relative_to(self.media_path)),
-            title=self.extract_timestamp_and_convert(child.name),
+            identifier=str(PurePath(*parts)),
+            title=title,
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.PLAYLIST,
+            can_expand=True,
+            can_play=False,
+        )
+
+    @staticmethod
+    def _build_more_item(parts: tuple[str, ...], cursor: str) -> BrowseMediaSource:
+        """Build the node expanding to the next page of a path."""
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=f"{PurePath(*parts)}{PAGE_SEPARATOR}{cursor}",
+            title="More...",
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.PLAYLIST,
+            can_expand=True,
+            can_play=False,
+        )
+
+    def _build_file_media_item(
+        self, entry: CatalogEntry, title: str | None = None
+    ) -> BrowseMediaSource:
+        """Build a file media item, titled by its time unless specified."""
+        file_path = PurePath(entry.path)
+        thumbnail_url = None
+        if entry.has_thumbnail:
+            thumbnail_url = async_process_play_media_url(
+                self.hass,
+                get_media_url(get_thumbnail_path(entry.path)),
+                allow_relative_url=True,
+                for_supervisor_network=True,
+            )
+        elif entry.has_snapshot:
+            # Thumbnail not generated yet, fall back to the snapshot
+            thumbnail_url = async_process_play_media_url(
+                self.hass,
+                get_media_url(
+                    file_path.parent.parent / "snapshot" / f"{file_path.stem}{EXT_JPG}"
+                ),
+                allow_relative_url=True,
+                for_supervisor_network=True,
+            )
+        media_class = self.get_media_class(file_path.suffix)
+        media_type = self.get_media_type(file_path.suffix)
+
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=entry.path,
+            title=title or self.extract_timestamp_and_convert(file_path.name),
             media_class=media_class,
             media_content_type=media_type,
             thumbnail=thumbnail_url,
@@ -150,12 +399,12 @@ class PetkitMediaSource(MediaSource):
         )
 
     def get_device_name_from_data(self, match_device: str) -> str:
-        """Match a string with a key in the data dictionary and extract the device name."""
-        data = self.coordinator.data_coordinator.data
-        for key, value in data.items():
-            if match_device in str(key):
-                return value.device_nfo.device_name.capitalize()
-        return match_device
+        """Return the name of a device from its id, or the id if unknown."""
+        if self.coordinator is None or not match_device.isdigit():
+            return match_device
+        return self.coordinator.data_coordinator.device_names.get(
+            int(match_device), match_device
+        )
 
     @staticmethod
     def convert_date(input_string: str) -> str:
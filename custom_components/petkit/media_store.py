@@ -0,0 +1,85 @@
+"""Content-addressed store of the media files for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from .const import LOGGER
+
+STORE_DIRNAME = ".store"
+
+
+class PetkitMediaStore:
+    """Store of the media files, addressed by the SHA-256 of their content.
+
+    Each content is stored once as {sha[:2]}/{sha}.{ext} and hardlinked into
+    the event directories. Filesystems without hardlinks keep plain copies.
+    All the methods are blocking and must be run in the executor.
+    """
+
+    def __init__(self, media_path: Path) -> None:
+        """Initialize the media store."""
+        self.store_path = media_path / STORE_DIRNAME
+
+    def object_path(self, checksum: str, suffix: str) -> Path:
+        """Return the path of a content in the store."""
+        return self.store_path / checksum[:2] / f"{checksum}{suffix}"
+
+    def deduplicate(self, file_path: Path, checksum: str) -> bool:
+        """Add a file to the store, return True if its content was already stored.
+
+        A file whose content is already stored is replaced by a hardlink.
+        """
+        object_path = self.object_path(checksum, file_path.suffix)
+        try:
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                object_path.hardlink_to(file_path)
+                return False
+            if object_path.samefile(file_path):
+                return False
+            self._link(object_path, file_path)
+        except OSError as err:
+            LOGGER.debug(f"Unable to deduplicate media file {file_path}: {err}")
+            return False
+        return True
+
+    def link(self, checksum: str, suffix: str, file_path: Path) -> bool:
+        """Create a file from a stored content, return False if not available."""
+        object_path = self.object_path(checksum, suffix)
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            self._link(object_path, file_path)
+        except OSError as err:
+            LOGGER.debug(f"Unable to link stored media to {file_path}: {err}")
+            return False
+        return True
+
+    @staticmethod
+    def _link(object_path: Path, file_path: Path) -> None:
+        """Atomically replace a file by a hardlink to a stored content."""
+        tmp_path = file_path.with_name(f"{file_path.name}.link")
+        tmp_path.hardlink_to(object_path)
+        tmp_path.replace(file_path)
+
+    def prune(self) -> int:
+        """Remove the stored contents no longer linked to any file."""
+        pruned = sum(
+            self._prune_object(object_path)
+            for object_path in self.store_path.glob("*/*")
+        )
+        if pruned:
+            LOGGER.debug(f"Pruned {pruned} stored media no longer used")
+        return pruned
+
+    @staticmethod
+    def _prune_object(object_path: Path) -> bool:
+        """Remove a stored content if no longer linked to any file."""
+        try:
+            if object_path.stat().st_nlink > 1:
+                return False
+            object_path.unlink()
+        except OSError as err:
+            LOGGER.debug(f"Unable to prune stored media {object_path}: {err}")
+            return False
+        return True
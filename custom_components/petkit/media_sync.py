@@ -0,0 +1,131 @@
+"""Single-flight media sync jobs for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine
+from contextlib import suppress
+from dataclasses import dataclass, field
+import time
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .const import LOGGER
+
+
+@dataclass(kw_only=True)
+class MediaSyncProgress:
+    """Progress of a media sync run."""
+
+    files_queued: int = 0
+    files_done: int = 0
+    files_failed: int = 0
+    bytes_done: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+
+    @property
+    def eta(self) -> float | None:
+        """Return the estimated seconds left, from the average time per file."""
+        if self.finished is not None:
+            return 0
+        if not self.files_done:
+            return None
+        elapsed = time.monotonic() - self.started
+        return elapsed / self.files_done * (self.files_queued - self.files_done)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the progress as a dict, for diagnostics."""
+        return {
+            "files_queued": self.files_queued,
+            "files_done": self.files_done,
+            "files_failed": self.files_failed,
+            "bytes_done": self.bytes_done,
+            "elapsed": round((self.finished or time.monotonic()) - self.started, 1),
+            "eta": None if self.eta is None else round(self.eta, 1),
+        }
+
+
+type MediaSyncFunction = Callable[
+    [set[int] | None, MediaSyncProgress], Coroutine[Any, Any, None]
+]
+
+
+class PetkitMediaSyncJob:
+    """Run the media sync of an account, one run at a time.
+
+    A sync covers some devices, or all of them. Syncs requested while one is
+    running are coalesced into a single rerun covering all their devices,
+    started once the running one is done. The job is a background task of
+    the config entry, cancelled when the entry is unloaded.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        sync: MediaSyncFunction,
+    ) -> None:
+        """Initialize the media sync job."""
+        self.hass = hass
+        self.config_entry = config_entry
+        self._sync = sync
+        self._task: asyncio.Task | None = None
+        self._rerun = False
+        self._devices: set[int] | None = set()  # Devices to sync, None for all
+        self.progress: MediaSyncProgress | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return True if a sync is running."""
+        return self._task is not None and not self._task.done()
+
+    @callback
+    def async_request(self, device_ids: set[int] | None = None) -> None:
+        """Start a sync of devices (all if None), or a rerun once the running one is done."""
+        if device_ids is None or self._devices is None:
+            self._devices = None
+        else:
+            self._devices = self._devices | device_ids
+        if self.running:
+            LOGGER.debug("Media sync still running, rerun scheduled")
+            self._rerun = True
+            return
+        self._task = self.config_entry.async_create_background_task(
+            self.hass, self._async_run(), "petkit_media_sync"
+        )
+
+    async def _async_run(self) -> None:
+        """Run the sync until no rerun is requested."""
+        while True:
+            devices, self._devices, self._rerun = self._devices, set(), False
+            self.progress = MediaSyncProgress()
+            try:
+                await self._sync(devices, self.progress)
+            finally:
+                self.progress.finished = time.monotonic()
+            LOGGER.debug(f"Media sync done: {self.progress.as_dict()}")
+            if not self._rerun:
+                return
+
+    async def async_cancel(self) -> None:
+        """Cancel the running sync and any rerun."""
+        self._rerun = False
+        self._devices = set()
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        if not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the job, for diagnostics."""
+        return {
+            "running": self.running,
+            "rerun_requested": self._rerun,
+            "progress": self.progress.as_dict() if self.progress else None,
+        }
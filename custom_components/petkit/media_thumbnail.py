@@ -0,0 +1,160 @@
+"""Thumbnails of the media files for Petkit Smart Devices."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+from pathlib import Path, PurePath
+from typing import TYPE_CHECKING
+
+from PIL import Image, UnidentifiedImageError
+
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    LOGGER,
+    MEDIA_THUMBNAIL_BATCH_SIZE,
+    MEDIA_THUMBNAIL_QUALITY,
+    MEDIA_THUMBNAIL_SIZE,
+    MEDIA_THUMBNAIL_WORKERS,
+)
+
+if TYPE_CHECKING:
+    from .media_catalog import CatalogEntry
+    from .media_index import PetkitMediaIndex
+
+THUMBNAIL_DIRNAME = ".thumbnails"
+
+
+def get_thumbnail_path(path: str) -> PurePath:
+    """Return the thumbnail path of a media file, relative to the media path.
+
+    Thumbnails are shared by the snapshot and the video of an event and stored
+    as .thumbnails/{device_id}/{YYYYMMDD}/{event_type}/{device_id}_{timestamp}.jpg
+    """
+    file_path = PurePath(path)
+    return (
+        PurePath(THUMBNAIL_DIRNAME)
+        / file_path.parent.parent
+        / file_path.with_suffix(".jpg").name
+    )
+
+
+def generate_thumbnail(source: Path, destination: Path) -> bool:
+    """Write a small JPEG thumbnail of an image (blocking I/O)."""
+    tmp_path = destination.with_name(f"{destination.name}.tmp")
+    try:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(source) as image:
+            image.draft("RGB", (MEDIA_THUMBNAIL_SIZE, MEDIA_THUMBNAIL_SIZE))
+            image.thumbnail((MEDIA_THUMBNAIL_SIZE, MEDIA_THUMBNAIL_SIZE))
+            image.convert("RGB").save(
+                tmp_path, "JPEG", quality=MEDIA_THUMBNAIL_QUALITY, optimize=True
+            )
+        tmp_path.replace(destination)
+    except (OSError, UnidentifiedImageError) as err:
+        LOGGER.debug(f"Unable to generate thumbnail of {source}: {err}")
+        return False
+    return True
+
+
+def resize_image(source: Path, width: int) -> bytes | None:
+    """Return a JPEG of an image downscaled to a width (blocking I/O)."""
+    try:
+        with Image.open(source) as image:
+            size = (width, max(1, round(image.height * width / image.width)))
+            image.draft("RGB", size)
+            image.thumbnail(size)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(
+                buffer, "JPEG", quality=MEDIA_THUMBNAIL_QUALITY, optimize=True
+            )
+    except (OSError, UnidentifiedImageError) as err:
+        LOGGER.debug(f"Unable to resize image {source}: {err}")
+        return None
+    return buffer.getvalue()
+
+
+class PetkitMediaThumbnails:
+    """Generate the thumbnails of the snapshots in the background.
+
+    Thumbnails are generated once per event from its snapshot, the Pillow work
+    running in a dedicated thread pool not to starve the Home Assistant one.
+    """
+
+    def __init__(self, hass: HomeAssistant, media_index: PetkitMediaIndex) -> None:
+        """Initialize the thumbnails generator."""
+        self.hass = hass
+        self.media_index = media_index
+        self.media_path = media_index.media_path
+        self._executor: ThreadPoolExecutor | None = None
+        self._shut_down = False
+
+    async def async_generate_pending(self) -> None:
+        """Generate a batch of the thumbnails missing from the catalog, most recent first.
+
+        A batch is generated per media sync, not to delay the next ones.
+        """
+        catalog = self.media_index.catalog
+        entries = await self.hass.async_add_executor_job(
+            catalog.entries_without_thumbnail, MEDIA_THUMBNAIL_BATCH_SIZE
+        )
+        if not entries:
+            return
+        results = await asyncio.gather(
+            *(self._async_generate(entry) for entry in entries)
+        )
+        for generated in (True, False):
+            await self.hass.async_add_executor_job(
+                catalog.set_thumbnails,
+                [
+                    entry.path
+                    for entry, result in zip(entries, results, strict=True)
+                    if result is generated
+                ],
+                generated,
+            )
+        self.media_index.notify_changed({entry.device_id for entry in entries})
+        LOGGER.debug(
+            f"Generated {sum(results)} thumbnails out of {len(entries)} snapshots"
+        )
+
+    async def async_resize(self, path: Path, width: int) -> bytes | None:
+        """Return a JPEG of an image downscaled to a width, in the thread pool."""
+        try:
+            executor = self._get_executor()
+        except RuntimeError:
+            return None
+        return await self.hass.loop.run_in_executor(executor, resize_image, path, width)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool, starting it if needed.
+
+        Raise RuntimeError once shut down, not to start a pool left running
+        after the entry is unloaded.
+        """
+        if self._shut_down:
+            raise RuntimeError("Thumbnail thread pool is shut down")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=MEDIA_THUMBNAIL_WORKERS,
+                thread_name_prefix="petkit_thumbnail",
+            )
+        return self._executor
+
+    async def _async_generate(self, entry: CatalogEntry) -> bool:
+        """Generate the thumbnail of a snapshot in the thread pool."""
+        return await self.hass.loop.run_in_executor(
+            self._get_executor(),
+            generate_thumbnail,
+            self.media_path / entry.path,
+            self.media_path / get_thumbnail_path(entry.path),
+        )
+
+    def shutdown(self) -> None:
+        """Shut down the thread pool (blocking)."""
+        self._shut_down = True
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
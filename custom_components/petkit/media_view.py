@@ -0,0 +1,68 @@
+"""HTTP view serving the media files of Petkit Smart Devices."""
+
+from __future__ import annotations
+
+from pathlib import PurePath
+
+from aiohttp import hdrs, web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+from homeassistant.util import raise_if_invalid_path
+
+from .const import COORDINATOR_MEDIA, DOMAIN
+from .media_thumbnail import THUMBNAIL_DIRNAME
+
+MEDIA_VIEW_URL = "/api/petkit/media"
+
+CONTENT_TYPES = {
+    "snapshot": "image/jpeg",
+    "video": "video/mp4",
+}
+
+
+def get_media_url(path: str | PurePath) -> str:
+    """Return the URL of a media file, from its path relative to the media path."""
+    return f"{MEDIA_VIEW_URL}/{path}"
+
+
+class PetkitMediaView(HomeAssistantView):
+    """Serve the media files and thumbnails stored under the media path.
+
+    Files are sent by aiohttp FileResponse, which handles byte ranges,
+    ETag/Last-Modified conditional requests and sendfile.
+    """
+
+    url = f"{MEDIA_VIEW_URL}/{{path:.+}}"
+    name = "api:petkit:media"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the media view."""
+        self.hass = hass
+
+    async def get(self, request: web.Request, path: str) -> web.FileResponse:
+        """Serve a media file."""
+        coordinator = self.hass.data.get(DOMAIN, {}).get(COORDINATOR_MEDIA)
+        if coordinator is None:
+            raise web.HTTPNotFound
+
+        try:
+            raise_if_invalid_path(path)
+        except ValueError as err:
+            raise web.HTTPBadRequest from err
+
+        if PurePath(path).parts[0] == THUMBNAIL_DIRNAME:
+            content_type = CONTENT_TYPES["snapshot"]
+        else:
+            entry = await self.hass.async_add_executor_job(
+                coordinator.media_index.catalog.get, path
+            )
+            if entry is None:
+                raise web.HTTPNotFound
+            content_type = CONTENT_TYPES[entry.record_type]
+
+        return web.FileResponse(
+            coordinator.media_path / path,
+            headers={hdrs.CONTENT_TYPE: content_type},
+        )
@@ -0,0 +1,191 @@
+"""Filesystem watcher keeping the media index of Petkit Smart Devices in sync."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from contextlib import suppress
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import LOGGER, MEDIA_WATCHER_DEBOUNCE
+from .media_index import parse_media_file
+
+if TYPE_CHECKING:
+    from watchdog.observers.api import BaseObserver, ObservedWatch
+
+    from .media_index import PetkitMediaIndex
+
+
+class PetkitMediaWatcher(FileSystemEventHandler):
+    """Apply the changes made under the media path to the media index.
+
+    Events are received from the watchdog thread (inotify on Linux), batched on
+    the event loop, then applied to the index after a short debounce delay.
+    Only the directories of the devices are watched, the media path may hold
+    other media libraries.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        media_index: PetkitMediaIndex,
+        on_change: Callable[[set[int]], None],
+    ) -> None:
+        """Initialize the media watcher."""
+        self.hass = hass
+        self.media_index = media_index
+        self.media_path = media_index.media_path
+        self._on_change = on_change
+        self._observer: BaseObserver | None = None
+        self._watches: dict[int, ObservedWatch] = {}
+        self._added: set[Path] = set()
+        self._removed: set[Path] = set()
+        self._removed_dirs: set[Path] = set()
+        self._reconcile = False
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    def start(self, device_ids: Iterable[int]) -> None:
+        """Start watching the media directories of devices (blocking I/O)."""
+        observer = Observer()
+        observer.start()
+        self._observer = observer
+        self.watch_devices(device_ids)
+
+    def watch_devices(self, device_ids: Iterable[int]) -> None:
+        """Watch the media directories of devices, once they exist (blocking I/O).
+
+        Devices whose directory does not exist yet are watched by a later call,
+        their first media being added to the index by the coordinator.
+        """
+        if self._observer is None:
+            return
+        for device_id in device_ids:
+            device_path = self.media_path / str(device_id)
+            is_dir = device_path.is_dir()
+            if (watch := self._watches.get(device_id)) is not None:
+                if is_dir:
+                    continue
+                # The directory was removed, its watch no longer applies
+                with suppress(KeyError):
+                    self._observer.unschedule(watch)
+                del self._watches[device_id]
+            if not is_dir:
+                continue
+            try:
+                self._watches[device_id] = self._observer.schedule(
+                    self, str(device_path), recursive=True
+                )
+            except OSError as err:
+                LOGGER.warning(f"Unable to watch media path {device_path}: {err}")
+                continue
+            LOGGER.debug(f"Watching media path {device_path}")
+
+    def stop(self) -> None:
+        """Stop watching the media path (blocking I/O)."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+            self._watches = {}
+
+    @callback
+    def async_cancel_flush(self) -> None:
+        """Cancel the pending changes."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+
+    def _is_device_path(self, path: Path) -> bool:
+        """Check if a path is located into a device media directory."""
+        try:
+            return path.relative_to(self.media_path).parts[0].isdigit()
+        except (ValueError, IndexError):
+            return False
+
+    def _queue_file(self, path: str | bytes, removed: bool) -> None:
+        """Queue a file change, from the watchdog thread."""
+        file_path = Path(str(path))
+        if parse_media_file(self.media_path, file_path) is not None:
+            self.hass.loop.call_soon_threadsafe(
+                self._async_queue, file_path, removed, False
+            )
+
+    def _queue_dir(self, path: str | bytes, removed: bool) -> None:
+        """Queue a directory change, from the watchdog thread."""
+        dir_path = Path(str(path))
+        if self._is_device_path(dir_path):
+            self.hass.loop.call_soon_threadsafe(
+                self._async_queue, dir_path, removed, True
+            )
+
+    def on_closed(self, event: FileSystemEvent) -> None:
+        """Handle a file closed after being written."""
+        if not event.is_directory:
+            self._queue_file(event.src_path, removed=False)
+
+    def on_created(self, event: FileSystemEvent) -> None:
+        """Handle a directory created, its files are caught by a reconciliation."""
+        if event.is_directory:
+            self._queue_dir(event.src_path, removed=False)
+
+    def on_deleted(self, event: FileSystemEvent) -> None:
+        """Handle a file or a directory deleted."""
+        if event.is_directory:
+            self._queue_dir(event.src_path, removed=True)
+        else:
+            self._queue_file(event.src_path, removed=True)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        """Handle a file or a directory moved."""
+        if event.is_directory:
+            self._queue_dir(event.src_path, removed=True)
+            self._queue_dir(event.dest_path, removed=False)
+        else:
+            self._queue_file(event.src_path, removed=True)
+            self._queue_file(event.dest_path, removed=False)
+
+    @callback
+    def _async_queue(self, path: Path, removed: bool, is_directory: bool) -> None:
+        """Queue a change and schedule its application to the index."""
+        if is_directory:
+            if removed:
+                self._removed_dirs.add(path)
+            else:
+                self._reconcile = True
+        elif removed:
+            self._added.discard(path)
+            self._removed.add(path)
+        else:
+            self._removed.discard(path)
+            self._added.add(path)
+
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self.hass, MEDIA_WATCHER_DEBOUNCE, self._async_flush
+            )
+
+    async def _async_flush(self, _now) -> None:
+        """Apply the queued changes to the media index."""
+        self._unsub_flush = None
+        added, self._added = self._added, set()
+        removed, self._removed = self._removed, set()
+        removed_dirs, self._removed_dirs = self._removed_dirs, set()
+        reconcile, self._reconcile = self._reconcile, False
+
+        changed_media = await self.media_index.async_remove_files(list(removed))
+        for dir_path in removed_dirs:
+            changed_media.extend(await self.media_index.async_remove_tree(dir_path))
+        changed_media.extend(await self.media_index.async_add_files(list(added)))
+        changed = {media_file.device_id for media_file in changed_media}
+        if reconcile:
+            changed |= await self.media_index.async_reconcile()
+
+        if changed:
+            LOGGER.debug(f"Media changes detected on disk for devices {changed}")
+            self._on_change(changed)
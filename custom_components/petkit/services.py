@@ -0,0 +1,130 @@
+"""Services of the Petkit Smart Devices integration."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pypetkitapi import RecordType
+import voluptuous as vol
+
+from homeassistant.const import ATTR_DEVICE_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+
+from .const import COORDINATOR_MEDIA, DOMAIN
+from .media_export import ARCHIVE_FORMATS, ARCHIVE_ZIP, MediaExportFilter, export_media
+
+if TYPE_CHECKING:
+    from .coordinator import PetkitMediaUpdateCoordinator
+
+SERVICE_EXPORT_MEDIA = "export_media"
+
+ATTR_PATH = "path"
+ATTR_FORMAT = "format"
+ATTR_START_DATE = "start_date"
+ATTR_END_DATE = "end_date"
+ATTR_EVENT_TYPES = "event_types"
+
+EXPORT_MEDIA_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_PATH): cv.string,
+        vol.Optional(ATTR_FORMAT, default=ARCHIVE_ZIP): vol.In(ARCHIVE_FORMATS),
+        vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_START_DATE): cv.date,
+        vol.Optional(ATTR_END_DATE): cv.date,
+        vol.Optional(ATTR_EVENT_TYPES): vol.All(
+            cv.ensure_list, [vol.In([str(record_type) for record_type in RecordType])]
+        ),
+    }
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_export_media(call: ServiceCall) -> ServiceResponse:
+        """Export media files into an archive."""
+        coordinator = hass.data.get(DOMAIN, {}).get(COORDINATOR_MEDIA)
+        if coordinator is None:
+            raise ServiceValidationError("Petkit integration is not loaded")
+
+        archive_path = Path(call.data[ATTR_PATH])
+        if not archive_path.is_absolute() or not hass.config.is_allowed_path(
+            str(archive_path)
+        ):
+            raise ServiceValidationError(
+                f"Cannot write to {archive_path}, add its folder to allowlist_external_dirs"
+            )
+
+        device_ids = None
+        if call.data.get(ATTR_DEVICE_ID):
+            device_ids = _get_petkit_device_ids(
+                hass, coordinator, call.data[ATTR_DEVICE_ID]
+            )
+
+        start_date = call.data.get(ATTR_START_DATE)
+        end_date = call.data.get(ATTR_END_DATE)
+        media_filter = MediaExportFilter(
+            device_ids=device_ids,
+            start_day=start_date.strftime("%Y%m%d") if start_date else None,
+            end_day=end_date.strftime("%Y%m%d") if end_date else None,
+            event_types=call.data.get(ATTR_EVENT_TYPES),
+        )
+
+        try:
+            files, size = await hass.async_add_executor_job(
+                export_media,
+                coordinator.media_index.catalog,
+                coordinator.media_path,
+                archive_path,
+                call.data[ATTR_FORMAT],
+                media_filter,
+            )
+        except OSError as err:
+            raise HomeAssistantError(
+                f"Unable to export media to {archive_path}: {err}"
+            ) from err
+        return {"path": str(archive_path), "files": files, "size": size}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_MEDIA,
+        async_export_media,
+        schema=EXPORT_MEDIA_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _get_petkit_device_ids(
+    hass: HomeAssistant,
+    coordinator: PetkitMediaUpdateCoordinator,
+    device_ids: list[str],
+) -> list[int]:
+    """Return the Petkit ids of Home Assistant devices, identified by serial number."""
+    ids_by_sn = {
+        str(device.sn): device_id
+        for device_id, device in coordinator.data_coordinator.data.items()
+    }
+    device_registry = dr.async_get(hass)
+    petkit_ids = []
+    for device_id in device_ids:
+        device = device_registry.async_get(device_id)
+        petkit_id = next(
+            (
+                ids_by_sn[identifier]
+                for domain, identifier in (device.identifiers if device else ())
+                if domain == DOMAIN and identifier in ids_by_sn
+            ),
+            None,
+        )
+        if petkit_id is None:
+            raise ServiceValidationError(f"Unknown Petkit device: {device_id}")
+        petkit_ids.append(petkit_id)
+    return petkit_ids